@@ -1,111 +1,69 @@
 import os
-import logging
-import requests
-import base64
-from pydub import AudioSegment
-import binascii
 import uuid
-from urllib.parse import urlparse
-from typing import Any
-import zipfile
-from io import BytesIO
-from logging.handlers import TimedRotatingFileHandler
+import subprocess
+from logging_utils import get_logger
 
-log_filename = "./logs/audio_processing.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+logger = get_logger(__name__, "logs/audio_processing.log")
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
-class RequestError(Exception):
-    def __init__(self, response):
-        self.response = response
-        logger.error(f"RequestError with response: {response}")
+# What the ASR models expect
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_DECODE_TIMEOUT = float(os.getenv("AUDIO_DECODE_TIMEOUT", "600"))
 
-def get_encoded_string(audio: Any):
-    try:
-        logger.info("Starting to process audio input")
-        
-        if isinstance(audio, str) and is_url(audio):
-            logger.info("Audio input is a URL")
-            local_filename = generate_temp_filename("mp3")
-            with requests.get(audio) as r:
-                with open(local_filename, 'wb') as f:
-                    f.write(r.content)
-        elif isinstance(audio, str) and is_base64(audio):
-            logger.info("Audio input is a base64 string")
-            local_filename = generate_temp_filename("mp3")
-            decoded_audio_content = base64.b64decode(audio)
-            with open(local_filename, "wb") as output_mp3_file:
-                output_mp3_file.write(decoded_audio_content)
-        else:
-            logger.info("Audio input is a file-like object")
-            local_filename = generate_temp_filename("mp3")
-            with open(local_filename, "wb") as output_file:
-                output_file.write(audio.read())
-        
-        logger.info("Converting audio to WAV format")
-        output_file = AudioSegment.from_file(local_filename)
-        mp3_output_file = output_file.export(local_filename, format="mp3")
-        given_audio = AudioSegment.from_file(mp3_output_file)
-        given_audio = given_audio.set_frame_rate(16000)
-        given_audio = given_audio.set_channels(1)
-        tmp_wav_filename = generate_temp_filename("wav")
-        given_audio.export(tmp_wav_filename, format="wav", codec="pcm_s16le")
-        
-        with open(tmp_wav_filename, "rb") as wav_file:
-            wav_file_content = wav_file.read()
-        
-        encoded_string = base64.b64encode(wav_file_content).decode('ascii', 'ignore')
-        
-        logger.info("Audio processing complete")
-        
-        os.remove(local_filename)
-        os.remove(tmp_wav_filename)
-        
-        return encoded_string, wav_file_content
-    except Exception as e:
-        logger.exception("Error processing audio input")
-        raise e
+# Raw 16 kHz mono 16-bit PCM, e.g. for silence detection
+PCM_OUTPUT = ["-f", "s16le", "-acodec", "pcm_s16le"]
+# What is sent upstream; several times smaller than the same samples as WAV
+FLAC_OUTPUT = ["-f", "flac", "-acodec", "flac", "-sample_fmt", "s16"]
 
-def is_base64(base64_string):
-    try:
-        base64.b64decode(base64_string)
-        logger.info("Base64 validation successful")
-        return True
-    except (binascii.Error, UnicodeDecodeError):
-        logger.error("Base64 validation failed")
-        return False
+def _run_ffmpeg(source, output_args, data=None, input_args=()):
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", *input_args, "-i", source, "-vn",
+               "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), *output_args, "pipe:1"]
+    return subprocess.run(command, input=data, capture_output=True, timeout=AUDIO_DECODE_TIMEOUT)
 
-def is_url(string):
-    try:
-        result = urlparse(string)
-        is_valid = all([result.scheme, result.netloc])
-        if is_valid:
-            logger.info("URL validation successful")
-        else:
-            logger.error("URL validation failed")
-        return is_valid
-    except ValueError:
-        logger.error("URL validation failed due to ValueError")
-        return False
+def _transcode(data, output_args, workdir="."):
+    """Convert ``data`` to 16 kHz mono in one ffmpeg pass, reading it from a pipe when possible."""
+    # MP4/MOV keep their index at the end, so ffmpeg cannot read them from a pipe
+    result = None if data[4:8] == b"ftyp" else _run_ffmpeg("pipe:0", output_args, data)
+    if result is None or result.returncode != 0 or not result.stdout:
+        if result is not None:
+            logger.warning(f"ffmpeg could not decode from a pipe, retrying from a file: {result.stderr.decode(errors='replace').strip()}")
+        local_filename = generate_temp_filename("audio", workdir=workdir)
+        try:
+            with open(local_filename, "wb") as f:
+                f.write(data)
+            result = _run_ffmpeg(local_filename, output_args)
+        finally:
+            os.remove(local_filename)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode audio: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
 
-def generate_temp_filename(ext, prefix="temp"):
-    filename = f"{prefix}_{uuid.uuid4()}.{ext}"
-    logger.info(f"Generated temporary filename: {filename}")
-    return filename
+def decode_to_pcm(data, workdir="."):
+    """Decode any ffmpeg-readable audio to 16 kHz mono 16-bit PCM."""
+    return _transcode(data, PCM_OUTPUT, workdir)
 
-def delete_mp3_files(directory: str):
-    """
-    Delete all .mp3 files generated by audio conversion
+def encode_pcm_flac(pcm):
+    """Encode raw 16 kHz mono 16-bit PCM as FLAC."""
+    result = _run_ffmpeg("pipe:0", FLAC_OUTPUT, pcm, ["-f", "s16le", "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "1"])
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode audio: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+def flac_stream_info(data):
+    """``(sample_rate, channels, bits_per_sample, total_samples)`` from a FLAC STREAMINFO block, or None if ``data`` is not FLAC.
+
+    ``total_samples`` is 0 when the encoder did not know the length (e.g. it wrote to a pipe).
     """
-    try:
-        for filename in os.listdir(directory):
-            if filename.endswith(".mp3"):
-                file_path = os.path.join(directory, filename)
-                os.remove(file_path)
-                logger.info("Succesfully removed ",file_path)
-        logger.info("All .mp3 files have been deleted.")
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
+    # "fLaC", then the STREAMINFO metadata block (type 0, 34 bytes) always comes first
+    if len(data) < 42 or data[:4] != b"fLaC" or data[4] & 0x7F != 0:
+        return None
+    packed = int.from_bytes(data[18:26], "big")
+    return packed >> 44, ((packed >> 41) & 0x7) + 1, ((packed >> 36) & 0x1F) + 1, packed & 0xFFFFFFFFF
+
+def is_conformant_flac(data):
+    info = flac_stream_info(data)
+    return info is not None and info[:3] == (AUDIO_SAMPLE_RATE, 1, 16)
+
+def generate_temp_filename(ext, prefix="temp", workdir="."):
+    filename = os.path.join(workdir, f"{prefix}_{uuid.uuid4()}.{ext}")
+    logger.info(f"Generated temporary filename: {filename}")
+    return filename
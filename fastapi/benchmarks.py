@@ -0,0 +1,226 @@
+"""Micro-benchmarks for the CPU hot paths of the translation pipelines.
+
+Each benchmark times one function on the test_data samples or a seeded
+synthetic input and reports min/median/mean per call. A run can be saved as
+the baseline and later runs fail (exit code 1) when a median regresses by
+more than --tolerance:
+
+    python benchmarks.py --save-baseline
+    python benchmarks.py --tolerance 0.2
+    python benchmarks.py --filter split
+
+Baselines are machine specific; record one on the machine that checks it.
+"""
+import os
+import io
+import sys
+import json
+import time
+import pickle
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import functools
+import subprocess
+if not os.path.exists("logs/"):
+    os.makedirs("logs/")
+
+from chunk_store import ChunkStore, make_chunks
+from pdf_utils import process_pdf, split_docs
+from translation_utils import split_text_into_chunks
+from segmentation import split_audio
+from video_utils import convert_videos_to_flac
+from generate_corpus import flac_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_DATA = os.path.join(HERE, "..", "test_data")
+BASELINE_PATH = os.path.join(HERE, "benchmarks_baseline.json")
+
+BENCHMARKS = []
+
+
+class Benchmark:
+    """``setup`` runs untimed before every call and returns the call's arguments."""
+
+    def __init__(self, name, func, setup=None, requires=None):
+        self.name = name
+        self.func = func
+        self.setup = setup or (lambda: ())
+        self.requires = requires
+
+    def skip_reason(self):
+        if self.requires and shutil.which(self.requires) is None:
+            return f"{self.requires} not installed"
+        return None
+
+    def run(self, min_time, min_rounds, max_rounds):
+        self.func(*self.setup())
+        timings, cpu_timings = [], []
+        total = 0.0
+        while len(timings) < max_rounds and (len(timings) < min_rounds or total < min_time):
+            args = self.setup()
+            started, cpu_started = time.perf_counter(), _cpu_seconds()
+            self.func(*args)
+            elapsed = time.perf_counter() - started
+            timings.append(elapsed)
+            cpu_timings.append(_cpu_seconds() - cpu_started)
+            total += elapsed
+        return {
+            "rounds": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "mean": statistics.fmean(timings),
+            "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "cpu_median": statistics.median(cpu_timings),
+        }
+
+def _cpu_seconds():
+    """CPU time of this process and its finished children (ffmpeg runs as a child)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def benchmark(name, setup=None, requires=None):
+    def register(func):
+        BENCHMARKS.append(Benchmark(name, func, setup, requires))
+        return func
+    return register
+
+
+def _sample(name):
+    return os.path.join(TEST_DATA, name)
+
+def _read(name, mode="rb"):
+    with open(_sample(name), mode) as f:
+        return f.read()
+
+def synthetic_text(chars, seed=0):
+    """Seeded Devanagari-like text with words, sentences and paragraphs."""
+    rng = random.Random(seed)
+    alphabet = [chr(code) for code in range(0x0915, 0x0939)] + [chr(code) for code in range(0x093E, 0x094D)]
+    parts, size = [], 0
+    while size < chars:
+        word = "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8)))
+        separator = rng.choices([" ", "। ", "\n\n"], weights=[90, 8, 2])[0]
+        parts.append(word + separator)
+        size += len(word) + len(separator)
+    return "".join(parts)[:chars]
+
+SMALL_TEXT = _read("hello.txt", "r")
+LARGE_TEXT = synthetic_text(2_000_000)
+CHUNKS = make_chunks("synthetic.txt", LARGE_TEXT, split_docs(LARGE_TEXT), "hi")
+CHUNKS_PICKLE = pickle.dumps(CHUNKS)
+
+_workdir = tempfile.mkdtemp(prefix="benchmarks_")
+
+@benchmark("process_pdf[hindi.pdf]", setup=lambda: (_sample("hindi.pdf"), ChunkStore()))
+def bench_process_pdf(pdf_path, chunk_store):
+    process_pdf(pdf_path, chunk_store)
+
+@benchmark("split_docs[synthetic 2M chars]", setup=lambda: (LARGE_TEXT,))
+@benchmark("split_docs[hello.txt]", setup=lambda: (SMALL_TEXT,))
+def bench_split_docs(text):
+    split_docs(text)
+
+@benchmark("split_text_into_chunks[synthetic 2M chars]", setup=lambda: (LARGE_TEXT,))
+def bench_split_text_into_chunks(text):
+    split_text_into_chunks(text)
+
+@benchmark("pickle.dumps[chunk list]")
+def bench_pickle_dump():
+    pickle.dumps(CHUNKS)
+
+@benchmark("pickle.loads[chunk list]")
+def bench_pickle_load():
+    pickle.loads(CHUNKS_PICKLE)
+
+@functools.lru_cache(maxsize=None)
+def long_recording(seconds, rate=16000, channels=1):
+    """A seeded FLAC recording; 16 kHz mono is passed through, anything else is re-encoded."""
+    recording = flac_bytes(seconds, seed=0)
+    if (rate, channels) == (16000, 1):
+        return recording
+    command = ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-ar", str(rate), "-ac", str(channels), "-f", "flac", "pipe:1"]
+    return subprocess.run(command, input=recording, capture_output=True, check=True).stdout
+
+@benchmark("split_audio[synthetic 600s 44.1kHz stereo flac]", setup=lambda: (long_recording(600, 44100, 2),), requires="ffmpeg")
+@benchmark("split_audio[synthetic 600s 16kHz mono flac]", setup=lambda: (long_recording(600),), requires="ffmpeg")
+@benchmark("split_audio[Hindi.flac]", setup=lambda: (_read("Hindi.flac"),), requires="ffmpeg")
+def bench_split_audio(audio):
+    split_audio(audio, _workdir)
+
+@benchmark("convert_videos_to_flac[test.mp4]", setup=lambda: ([io.BytesIO(_read("test.mp4"))], tempfile.mkdtemp(dir=_workdir)), requires="ffmpeg")
+def bench_convert_videos_to_flac(video_files, output_folder):
+    convert_videos_to_flac(video_files, output_folder)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or "median" not in result:
+            continue
+        change = result["median"] / previous["median"] - 1
+        result["change"] = round(change, 4)
+        if change > tolerance:
+            regressions.append((name, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum timed seconds per benchmark")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed median slowdown before failing, 0.2 = 20%%")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    try:
+        for bench in BENCHMARKS:
+            if args.filter not in bench.name:
+                continue
+            reason = bench.skip_reason()
+            if reason:
+                results[bench.name] = {"skipped": reason}
+                continue
+            results[bench.name] = bench.run(args.min_time, args.min_rounds, args.max_rounds)
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for name, result in results.items():
+        if "median" in result:
+            change = f"  {result['change']:+.1%} vs baseline" if "change" in result else ""
+            print(f"{name:<56} median {result['median'] * 1000:10.3f}ms  min {result['min'] * 1000:10.3f}ms  cpu {result['cpu_median'] * 1000:10.3f}ms  rounds {result['rounds']:>5}{change}")
+        else:
+            print(f"{name:<56} skipped ({result['skipped']})")
+
+    run = {"python": platform.python_version(), "machine": platform.machine(), "benchmarks": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        for name, change in regressions:
+            print(f"REGRESSION {name}: median {change:+.1%} (tolerance {args.tolerance:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
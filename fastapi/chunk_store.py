@@ -0,0 +1,113 @@
+import os
+import pickle
+import threading
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/chunk_store.log")
+
+CHUNK_SPILL_BYTES = int(os.getenv("CHUNK_SPILL_BYTES", str(256 * 1024 * 1024)))
+
+
+class Chunk:
+    """One piece of an extracted document as it moves through the pipeline.
+
+    ``start``/``end`` are character offsets into the file's text (None if the
+    splitter changed the text so it cannot be found). Use ``to_document`` where
+    a LangChain ``Document`` is really needed.
+    """
+
+    __slots__ = ("text", "file_id", "index", "start", "end", "language")
+
+    def __init__(self, text, file_id, index, start=None, end=None, language=None):
+        self.text = text
+        self.file_id = file_id
+        self.index = index
+        self.start = start
+        self.end = end
+        self.language = language
+
+    @property
+    def metadata(self):
+        return {"filename": self.file_id, "date_filename": True, "index": self.index, "start": self.start, "end": self.end, "language": self.language}
+
+    def __reduce__(self):
+        # Positional args pickle smaller and faster than the default slots state
+        return Chunk, (self.text, self.file_id, self.index, self.start, self.end, self.language)
+
+    def to_document(self):
+        from langchain.docstore.document import Document
+        return Document(page_content=self.text, metadata=self.metadata)
+
+    def __repr__(self):
+        return f"Chunk({self.file_id!r}, {self.index}, {len(self.text)} chars)"
+
+
+def make_chunks(file_id, content, pieces, language=None):
+    """Wrap the split ``pieces`` of ``content`` in Chunks, locating each one's offsets."""
+    chunks, search_from = [], 0
+    for index, piece in enumerate(pieces):
+        start = content.find(piece, search_from)
+        if start < 0:
+            chunks.append(Chunk(piece, file_id, index, language=language))
+            continue
+        chunks.append(Chunk(piece, file_id, index, start, start + len(piece), language))
+        # Pieces overlap, so the next one starts after this one's start
+        search_from = start + 1
+    return chunks
+
+
+def member_name(path, root_directory):
+    """Name of an extracted zip member: its path inside the zip, which unlike its basename is unique."""
+    return os.path.relpath(path, root_directory).replace(os.sep, "/")
+
+
+class ChunkStore:
+    """Extracted Chunks per source file, handed from the readers to translation.
+
+    Chunks stay in memory until they add up to ``spill_bytes`` of text; files
+    added after that are pickled to ``spill_dir`` and loaded back one at a time
+    when iterated. Without a ``spill_dir`` everything stays in memory.
+    """
+
+    def __init__(self, spill_dir=None, spill_bytes=CHUNK_SPILL_BYTES, language=None):
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.language = language
+        self._files = []
+        self._memory_bytes = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, file_id, chunks):
+        size = sum(len(chunk.text.encode("utf-8")) for chunk in chunks)
+        with self._lock:
+            spill = self.spill_dir is not None and self._memory_bytes + size > self.spill_bytes
+            if not spill:
+                self._memory_bytes += size
+            self._count += len(chunks)
+            index = len(self._files)
+            self._files.append(None)
+        if spill:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{index}.pkl")
+            with open(path, "wb") as f:
+                pickle.dump(chunks, f)
+            logger.info(f"Spilled {len(chunks)} chunks of {file_id} to {path}.")
+            self._files[index] = (file_id, path, len(chunks))
+        else:
+            self._files[index] = (file_id, chunks, len(chunks))
+
+    def count(self):
+        return self._count
+
+    def files(self):
+        """Yield ``(file_id, chunks)`` in the order files were added."""
+        for file_id, chunks, _ in list(self._files):
+            if isinstance(chunks, str):
+                with open(chunks, "rb") as f:
+                    chunks = pickle.load(f)
+            yield file_id, chunks
+
+    def stats(self):
+        spilled = sum(1 for _, chunks, _ in self._files if isinstance(chunks, str))
+        return {"files": len(self._files), "chunks": self._count, "memory_bytes": self._memory_bytes, "spilled_files": spilled}
@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+from collections import deque
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/circuit_breaker.log")
+
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "30"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Upstream {name} is unavailable, retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Per-upstream breaker over a sliding time window of call outcomes.
+
+    Opens when at least ``min_calls`` calls in the window fail or exceed
+    ``slow_call_seconds`` at ``failure_rate`` or more. While open every call
+    fails fast; after ``open_seconds`` up to ``half_open_probes`` calls are let
+    through and the first probe outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS, window=BREAKER_WINDOW,
+                 slow_call_seconds=BREAKER_SLOW_CALL_SECONDS, open_seconds=BREAKER_OPEN_SECONDS, half_open_probes=BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._calls = deque()
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError. Returns True for a half-open probe."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self.state, self._probes = HALF_OPEN, 0
+                logger.info(f"Circuit {self.name} half-open, sending probe.")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes += 1
+                return True
+            return False
+
+    def record(self, success, latency, probe=False):
+        failed = not success or latency > self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            if probe and self.state == HALF_OPEN:
+                if failed:
+                    self._open(now, "probe failed")
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit {self.name} closed after successful probe.")
+                return
+            if self.state != CLOSED:
+                return
+
+            self._calls.append((now, failed))
+            while self._calls and self._calls[0][0] < now - self.window:
+                self._calls.popleft()
+            failures = sum(1 for _, call_failed in self._calls if call_failed)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+                self._open(now, f"{failures}/{len(self._calls)} calls failed or were slow")
+
+    def cancel(self, probe=False):
+        """Forget an admitted call that ended without an outcome (e.g. it was cancelled)."""
+        if not probe:
+            return
+        with self._lock:
+            # Let another probe through instead of staying half-open for good
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _open(self, now, reason):
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        logger.error(f"Circuit {self.name} opened for {self.open_seconds}s: {reason}.")
+
+    def stats(self):
+        with self._lock:
+            failures = sum(1 for _, failed in self._calls if failed)
+            return {"state": self.state, "window_calls": len(self._calls), "window_failures": failures, "rejected": self._rejected}
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name)
+            return breaker
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+circuit_breakers = BreakerRegistry()
@@ -0,0 +1,342 @@
+"""Reproducible large inputs for load_test.py and benchmarks.py.
+
+Every generator is driven by --seed, so the same command always produces the
+same bytes:
+
+    python generate_corpus.py text --size 2G --language hi
+    python generate_corpus.py pdf --pages 400 --language ta
+    python generate_corpus.py zip --members 5000 --member-kind txt
+    python generate_corpus.py audio --duration 3600
+    python generate_corpus.py video --duration 3600
+    python generate_corpus.py mixed --members 200
+    python generate_corpus.py all
+
+Files go to ../test_data/generated/ unless --output-dir is given. PDFs carry a
+ToUnicode map but no embedded font, so they extract correctly but do not
+render glyphs. Audio and video need ffmpeg.
+"""
+import os
+import io
+import json
+import zlib
+import random
+import shutil
+import zipfile
+import argparse
+import subprocess
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(HERE, "..", "test_data", "generated")
+
+# Unicode ranges of the letters and vowel signs of each script
+SCRIPTS = {
+    "devanagari": [(0x0905, 0x0914), (0x0915, 0x0939), (0x093E, 0x094C)],
+    "bengali": [(0x0985, 0x098C), (0x0995, 0x09A8), (0x09AA, 0x09B0), (0x09BE, 0x09C4)],
+    "gurmukhi": [(0x0A05, 0x0A0A), (0x0A15, 0x0A28), (0x0A2A, 0x0A30), (0x0A3E, 0x0A42)],
+    "gujarati": [(0x0A85, 0x0A8B), (0x0A95, 0x0AA8), (0x0AAA, 0x0AB0), (0x0ABE, 0x0AC5)],
+    "oriya": [(0x0B05, 0x0B0B), (0x0B15, 0x0B28), (0x0B2A, 0x0B30), (0x0B3E, 0x0B43)],
+    "tamil": [(0x0B85, 0x0B8A), (0x0B95, 0x0B95), (0x0B9A, 0x0B9A), (0x0BA4, 0x0BA4), (0x0BA8, 0x0BAA), (0x0BAE, 0x0BB9), (0x0BBE, 0x0BC2)],
+    "telugu": [(0x0C05, 0x0C0C), (0x0C15, 0x0C28), (0x0C2A, 0x0C39), (0x0C3E, 0x0C44)],
+    "kannada": [(0x0C85, 0x0C8C), (0x0C95, 0x0CA8), (0x0CAA, 0x0CB3), (0x0CBE, 0x0CC4)],
+    "malayalam": [(0x0D05, 0x0D0C), (0x0D15, 0x0D28), (0x0D2A, 0x0D39), (0x0D3E, 0x0D44)],
+    "arabic": [(0x0627, 0x063A), (0x0641, 0x064A)],
+    "ol_chiki": [(0x1C5A, 0x1C77)],
+    "latin": [(0x0061, 0x007A)],
+}
+
+LANGUAGE_SCRIPTS = {
+    "hi": "devanagari", "gom": "devanagari", "doi": "devanagari", "brx": "devanagari", "mr": "devanagari",
+    "mai": "devanagari", "sa": "devanagari", "ne": "devanagari", "as": "bengali", "bn": "bengali",
+    "mni": "bengali", "pa": "gurmukhi", "gu": "gujarati", "or": "oriya", "ta": "tamil", "te": "telugu",
+    "kn": "kannada", "ml": "malayalam", "ur": "arabic", "ks": "arabic", "sd": "arabic", "sat": "ol_chiki",
+    "en": "latin",
+}
+
+SENTENCE_END = {"devanagari": "। ", "bengali": "। ", "arabic": "۔ ", "ol_chiki": "᱾ "}
+
+
+def parse_size(value):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class TextSource:
+    """Seeded word stream in one language's script, built from a fixed vocabulary."""
+
+    def __init__(self, language, seed, vocabulary=5000):
+        if language not in LANGUAGE_SCRIPTS:
+            raise ValueError(f"Unknown language {language}")
+        self.language = language
+        self.script = LANGUAGE_SCRIPTS[language]
+        self.rng = random.Random(f"{seed}:{language}")
+        letters = [chr(code) for start, end in SCRIPTS[self.script] for code in range(start, end + 1)]
+        self.words = ["".join(self.rng.choice(letters) for _ in range(self.rng.randint(2, 9))) for _ in range(vocabulary)]
+        self.sentence_end = SENTENCE_END.get(self.script, ". ")
+
+    def paragraph(self):
+        sentences = []
+        for _ in range(self.rng.randint(2, 8)):
+            words = self.rng.choices(self.words, k=self.rng.randint(5, 25))
+            sentences.append(" ".join(words) + self.sentence_end)
+        return "".join(sentences).rstrip() + "\n\n"
+
+    def text(self, chars):
+        parts, size = [], 0
+        while size < chars:
+            paragraph = self.paragraph()
+            parts.append(paragraph)
+            size += len(paragraph)
+        return "".join(parts)[:chars]
+
+    def lines(self, width):
+        """Endless lines of at most ``width`` characters, blank lines between paragraphs."""
+        while True:
+            line = ""
+            for word in self.paragraph().split():
+                if line and len(line) + 1 + len(word) > width:
+                    yield line
+                    line = word
+                else:
+                    line = f"{line} {word}" if line else word
+            yield line
+            yield ""
+
+
+def write_text(path, size, language, seed):
+    """Stream ``size`` bytes of UTF-8 text without holding it in memory."""
+    source = TextSource(language, seed)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < size:
+            block = "".join(source.paragraph() for _ in range(200))
+            data = block.encode("utf-8")
+            if written + len(data) > size:
+                # Cut on a character boundary
+                data = data[:size - written].decode("utf-8", "ignore").encode("utf-8")
+                block = data.decode("utf-8")
+            f.write(block)
+            written += len(data)
+            if not data:
+                break
+    return path
+
+
+def _tounicode_cmap(text_blocks):
+    ranges = "\n".join(f"<{block:04X}> <{block + 0xFF:04X}> <{block:04X}>" for block in sorted(text_blocks))
+    return (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+        f"{len(text_blocks)} beginbfrange\n{ranges}\nendbfrange\n"
+        "endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend\n"
+    ).encode("ascii")
+
+
+def pdf_bytes(pages, language, seed, lines_per_page=48, chars_per_line=90):
+    """A PDF whose text layer is ``pages`` pages of seeded text in ``language``.
+
+    Text is shown with an Identity-H Type0 font whose CIDs are the Unicode code
+    points, so pdfminer recovers the original characters via ToUnicode.
+    """
+    source = TextSource(language, seed)
+    lines = source.lines(chars_per_line)
+    blocks = {0x0000}
+    page_streams = []
+    for _ in range(pages):
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        for _ in range(lines_per_page):
+            line = next(lines)
+            blocks.update(ord(char) & 0xFF00 for char in line)
+            commands.append(f"<{line.encode('utf-16-be').hex()}> Tj T*")
+        commands.append("ET")
+        page_streams.append(zlib.compress("\n".join(commands).encode("ascii")))
+
+    # 1 catalog, 2 page tree, 3-6 font, then a page and its content stream per page
+    page_ids = [7 + 2 * i for i in range(pages)]
+    cmap = _tounicode_cmap(blocks)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {pages} >>".encode("ascii"),
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /SyntheticIndic /Encoding /Identity-H /DescendantFonts [4 0 R] /ToUnicode 6 0 R >>",
+        b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /SyntheticIndic /CIDToGIDMap /Identity /DW 500"
+        b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> /FontDescriptor 5 0 R >>",
+        b"<< /Type /FontDescriptor /FontName /SyntheticIndic /Flags 4 /FontBBox [0 -200 1000 900] /ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 >>",
+        f"<< /Length {len(cmap)} >>\nstream\n".encode("ascii") + cmap + b"\nendstream",
+    ]
+    for page_id, stream in zip(page_ids, page_streams):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("ascii"))
+        objects.append(f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+    out.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+    return out.getvalue()
+
+
+def write_pdf(path, pages, language, seed):
+    with open(path, "wb") as f:
+        f.write(pdf_bytes(pages, language, seed))
+    return path
+
+
+def write_zip(path, members, kind, language, seed, member_size=4096, pages=2, duration=30):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        source = TextSource(language, seed)
+        for i in range(members):
+            if kind == "txt":
+                zip_ref.writestr(f"{language}_{i:05d}.txt", source.text(member_size))
+            elif kind == "pdf":
+                zip_ref.writestr(f"{language}_{i:05d}.pdf", pdf_bytes(pages, language, f"{seed}:{i}"))
+            elif kind == "flac":
+                zip_ref.writestr(f"{language}_{i:05d}.flac", flac_bytes(duration, f"{seed}:{i}"))
+            else:
+                raise ValueError(f"Unknown member kind {kind}")
+    return path
+
+
+def write_mixed(path, members, seed, languages=None, member_size=4096):
+    """Archive of TXT and PDF members in many languages, with a manifest of which is which."""
+    rng = random.Random(seed)
+    languages = languages or [language for language in LANGUAGE_SCRIPTS if language != "en"]
+    sources = {}
+    manifest = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for i in range(members):
+            language = rng.choice(languages)
+            kind = rng.choice(["txt", "pdf"])
+            name = f"{i:05d}_{language}.{kind}"
+            if kind == "txt":
+                source = sources.setdefault(language, TextSource(language, seed))
+                zip_ref.writestr(name, source.text(rng.randint(member_size // 4, member_size * 4)))
+            else:
+                zip_ref.writestr(name, pdf_bytes(rng.randint(1, 5), language, f"{seed}:{i}"))
+            manifest.append({"name": name, "language": language, "kind": kind})
+        zip_ref.writestr("manifest.json", json.dumps(manifest, indent=1))
+    return path
+
+
+def speech_like_pcm(duration, seed, sample_rate=16000, block_seconds=60):
+    """Yield 16-bit mono PCM blocks: tone bursts of 0.5-8 s separated by 0.2-2 s of near silence."""
+    rng = np.random.default_rng(zlib.crc32(str(seed).encode("utf-8")))
+    total = int(duration * sample_rate)
+    position = 0
+    segments = []
+    while position < total:
+        burst = int(rng.uniform(0.5, 8.0) * sample_rate)
+        pause = int(rng.uniform(0.2, 2.0) * sample_rate)
+        segments.append((position, min(total, position + burst), rng.uniform(120, 320)))
+        position += burst + pause
+
+    block = int(block_seconds * sample_rate)
+    segment_index = 0
+    for start in range(0, total, block):
+        end = min(total, start + block)
+        t = np.arange(start, end) / sample_rate
+        signal = rng.normal(0, 0.002, end - start)
+        while segment_index < len(segments) and segments[segment_index][1] <= start:
+            segment_index += 1
+        for seg_start, seg_end, pitch in segments[segment_index:]:
+            if seg_start >= end:
+                break
+            lo, hi = max(seg_start, start) - start, min(seg_end, end) - start
+            seg_t = t[lo:hi]
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * seg_t)
+            signal[lo:hi] += 0.3 * envelope * (np.sin(2 * np.pi * pitch * seg_t) + 0.5 * np.sin(2 * np.pi * 2.1 * pitch * seg_t))
+        yield (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def _require_ffmpeg():
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg is required to generate audio and video")
+
+def _ffmpeg_from_pcm(duration, seed, output_args):
+    _require_ffmpeg()
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ar", "16000", "-ac", "1", "-i", "pipe:0"] + output_args
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE if output_args[-1] == "pipe:1" else None)
+    if output_args[-1] == "pipe:1":
+        # Small clips only: collect the encoded output in memory
+        data = b"".join(speech_like_pcm(duration, seed))
+        out, _ = process.communicate(data)
+        return out
+    for block in speech_like_pcm(duration, seed):
+        process.stdin.write(block)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise SystemExit(f"ffmpeg failed with exit code {process.returncode}")
+    return None
+
+def write_audio(path, duration, seed):
+    _ffmpeg_from_pcm(duration, seed, ["-c:a", "flac", path])
+    return path
+
+def flac_bytes(duration, seed):
+    return _ffmpeg_from_pcm(duration, seed, ["-c:a", "flac", "-f", "flac", "pipe:1"])
+
+def write_video(path, duration, seed):
+    _ffmpeg_from_pcm(duration, seed, ["-f", "lavfi", "-i", f"testsrc2=size=320x240:rate=10:duration={duration}",
+                                      "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path])
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=["text", "pdf", "zip", "audio", "video", "mixed", "all"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--language", default="hi", choices=sorted(LANGUAGE_SCRIPTS))
+    parser.add_argument("--size", default="1G", help="Text file size, e.g. 500M or 2G")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--member-kind", default="txt", choices=["txt", "pdf", "flac"], help="Member type for zip; flac members use --duration seconds")
+    parser.add_argument("--duration", type=float, default=3600, help="Audio/video length in seconds")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--output", help="File name inside --output-dir")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def target(default_name):
+        return os.path.join(args.output_dir, args.output or default_name)
+
+    written = []
+    if args.kind == "text":
+        written.append(write_text(target(f"text_{args.language}_{args.size}_{args.seed}.txt"), parse_size(args.size), args.language, args.seed))
+    elif args.kind == "pdf":
+        written.append(write_pdf(target(f"pdf_{args.language}_{args.pages}p_{args.seed}.pdf"), args.pages, args.language, args.seed))
+    elif args.kind == "zip":
+        written.append(write_zip(target(f"zip_{args.member_kind}_{args.language}_{args.members}_{args.seed}.zip"), args.members, args.member_kind, args.language, args.seed, duration=args.duration))
+    elif args.kind == "audio":
+        written.append(write_audio(target(f"audio_{int(args.duration)}s_{args.seed}.flac"), args.duration, args.seed))
+    elif args.kind == "video":
+        written.append(write_video(target(f"video_{int(args.duration)}s_{args.seed}.mp4"), args.duration, args.seed))
+    elif args.kind == "mixed":
+        written.append(write_mixed(target(f"mixed_{args.members}_{args.seed}.zip"), args.members, args.seed))
+    else:
+        # The default scale-test set
+        written.append(write_text(os.path.join(args.output_dir, f"text_hi_1G_{args.seed}.txt"), parse_size("1G"), "hi", args.seed))
+        written.append(write_pdf(os.path.join(args.output_dir, f"pdf_hi_300p_{args.seed}.pdf"), 300, "hi", args.seed))
+        written.append(write_zip(os.path.join(args.output_dir, f"zip_txt_hi_2000_{args.seed}.zip"), 2000, "txt", "hi", args.seed))
+        written.append(write_mixed(os.path.join(args.output_dir, f"mixed_200_{args.seed}.zip"), 200, args.seed))
+        if shutil.which("ffmpeg"):
+            written.append(write_audio(os.path.join(args.output_dir, f"audio_3600s_{args.seed}.flac"), 3600, args.seed))
+            written.append(write_video(os.path.join(args.output_dir, f"video_3600s_{args.seed}.mp4"), 3600, args.seed))
+        else:
+            print("ffmpeg not found, skipping audio and video")
+
+    for path in written:
+        print(f"{path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import json
+import asyncio
+import contextlib
+import threading
+from urllib.parse import urlparse
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/http_client.log")
+
+# Number of distinct hosts whose pools are kept alive per worker
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# Keep-alive connections per host; with HTTP_POOL_BLOCK this is also a hard cap
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "1") == "1"
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+
+
+def _parse_host_limits(value):
+    # "dhruva-api.bhashini.gov.in=64,meity-auth.ulcacontrib.org=8"
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, size = item.partition("=")
+        limits[host.strip()] = int(size)
+    return limits
+
+HTTP_HOST_LIMITS = _parse_host_limits(os.getenv("HTTP_HOST_LIMITS", ""))
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        return self._hosts.setdefault(host, {"requests": 0, "new_connections": 0})
+
+    def record_request(self, host):
+        with self._lock:
+            self._host(host)["requests"] += 1
+
+    def record_connection(self, host):
+        with self._lock:
+            self._host(host)["new_connections"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hosts = {host: dict(counts) for host, counts in self._hosts.items()}
+        for counts in hosts.values():
+            reused = max(counts["requests"] - counts["new_connections"], 0)
+            counts["reuse_rate"] = round(reused / counts["requests"], 4) if counts["requests"] else 0.0
+        return hosts
+
+pool_stats = PoolStats()
+
+
+def _counting_pool(base):
+    class CountingConnectionPool(base):
+        def __init__(self, host, port=None, *args, **kwargs):
+            if host in HTTP_HOST_LIMITS:
+                kwargs["maxsize"] = HTTP_HOST_LIMITS[host]
+            super().__init__(host, port, *args, **kwargs)
+
+        def _new_conn(self):
+            pool_stats.record_connection(self.host)
+            logger.info(f"Opening new connection to {self.host} ({self.num_connections + 1} so far).")
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool),
+            "https": _counting_pool(HTTPSConnectionPool),
+        }
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return this worker's shared keep-alive session, creating it after fork."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = PooledHTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, os.getpid()
+                logger.info(f"Created HTTP session for worker {_session_pid} (pool size {HTTP_POOL_MAXSIZE} per host).")
+    return _session
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    pool_stats.record_request(urlparse(url).hostname)
+    return get_session().request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+def get_pool_stats():
+    return pool_stats.snapshot()
+
+
+class AsyncResponse:
+    """Fully read aiohttp response, so callers need no context manager."""
+
+    def __init__(self, response, content):
+        self._response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+
+def _trace_config():
+    async def on_request_start(session, ctx, params):
+        ctx.host = params.url.host
+        pool_stats.record_request(ctx.host)
+
+    async def on_connection_create_end(session, ctx, params):
+        pool_stats.record_connection(ctx.host)
+        logger.info(f"Opening new async connection to {ctx.host}.")
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+
+_async_sessions = {}
+_host_semaphores = {}
+
+def get_async_session():
+    """Return the keep-alive aiohttp session bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE, limit_per_host=HTTP_POOL_MAXSIZE)
+        timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[_trace_config()])
+        _async_sessions[loop] = session
+        logger.info(f"Created async HTTP session for worker {os.getpid()} (pool size {HTTP_POOL_MAXSIZE} per host).")
+    return session
+
+def _host_semaphore(host):
+    if host not in HTTP_HOST_LIMITS:
+        return None
+    loop = asyncio.get_running_loop()
+    semaphore = _host_semaphores.get((loop, host))
+    if semaphore is None:
+        semaphore = _host_semaphores[(loop, host)] = asyncio.Semaphore(HTTP_HOST_LIMITS[host])
+    return semaphore
+
+async def request_async(method, url, **kwargs):
+    session = get_async_session()
+    async with _host_semaphore(urlparse(url).hostname) or contextlib.nullcontext():
+        async with session.request(method, url, **kwargs) as response:
+            return AsyncResponse(response, await response.read())
+
+async def get_async(url, **kwargs):
+    return await request_async("GET", url, **kwargs)
+
+async def post_async(url, **kwargs):
+    return await request_async("POST", url, **kwargs)
+
+async def close_async_sessions():
+    for session in list(_async_sessions.values()):
+        await session.close()
+    _async_sessions.clear()
+    _host_semaphores.clear()
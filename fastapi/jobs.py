@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import ipaddress
+import asyncio
+import threading
+from urllib.parse import urlparse
+from fastapi import UploadFile
+from logging_utils import get_logger
+
+import http_client
+from retry_policy import RetryPolicy
+from circuit_breaker import CircuitOpenError
+from output_store import ChunkOutputStore
+from pipelines import transcribe_audio_file, transcribe_audio_archive, translate_document, transcribe_video_file
+
+logger = get_logger(__name__, "logs/jobs.log")
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_DIR = os.getenv("JOB_DIR", "jobs")
+# Background workers per uvicorn process; 0 makes this process accept jobs without running them
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Progress can tick per chunk; it is written at most once per interval
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+# Webhooks are POSTed from inside the network, so only public https hosts by
+# default; an allowlist restricts delivery to (and trusts) the listed hosts
+WEBHOOK_ALLOW_HTTP = os.getenv("WEBHOOK_ALLOW_HTTP", "0") == "1"
+WEBHOOK_ALLOWED_HOSTS = {host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()}
+
+JOB_KINDS = {
+    "pdf": (".pdf", ".zip"),
+    "txt": (".txt", ".zip"),
+    "audio": (".flac",),
+    "audio_zip": (".zip",),
+    "video": (".mp4",),
+}
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+webhook_retry = RetryPolicy.from_env("WEBHOOK")
+
+
+class JobStore:
+    """Job rows in SQLite and uploads/results on disk, shared by every worker
+    process on the host so any of them can answer a poll or run a job.
+    """
+
+    def __init__(self, path, job_dir):
+        self.path = path
+        self.job_dir = job_dir
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        # Opened on first use so importing the module creates no files; called with the lock held
+        if self._conn is None:
+            os.makedirs(self.job_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, source_language TEXT NOT NULL, "
+                "file_name TEXT NOT NULL, status TEXT NOT NULL, completed INTEGER NOT NULL DEFAULT 0, total INTEGER, "
+                "error TEXT, webhook_url TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, heartbeat_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            self._conn = conn
+        return self._conn
+
+    def upload_path(self, job_id):
+        return os.path.join(self.job_dir, job_id, "upload")
+
+    def result_path(self, job_id):
+        return os.path.join(self.job_dir, job_id, "result.json")
+
+    def output_path(self, job_id):
+        """Translated chunks of a pdf/txt job, kept across attempts so a reclaimed job resumes."""
+        return os.path.join(self.job_dir, job_id, "translations.jsonl")
+
+    def output_record(self, job_id, position):
+        """The ``position``-th chunk a pdf/txt job has translated so far, or None."""
+        path = self.output_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with ChunkOutputStore(path, readonly=True) as output_store:
+            return output_store.read(position) if 0 <= position < len(output_store) else None
+
+    def create(self, kind, source_language, file_name, upload, webhook_url=None):
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.job_dir, job_id))
+        with open(self.upload_path(job_id), "wb") as f:
+            shutil.copyfileobj(upload, f, 1024 * 1024)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (id, kind, source_language, file_name, status, webhook_url, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, source_language, file_name, QUEUED, webhook_url, time.time()),
+            )
+        logger.info(f"Queued {kind} job {job_id} for {file_name}.")
+        return job_id
+
+    def queued(self):
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def claim(self, worker):
+        """Atomically take the oldest queued job, or one whose worker stopped heart-beating."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = now - JOB_STALE_SECONDS
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, "Worker lost while running the job", now, RUNNING, stale, JOB_MAX_ATTEMPTS),
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, stale),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?, completed = 0, total = NULL WHERE id = ?",
+                        (RUNNING, worker, now, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is not None and row["status"] == RUNNING:
+            logger.warning(f"Reclaimed job {row['id']} from unresponsive worker {row['worker']}.")
+        return dict(row) if row is not None else None
+
+    # heartbeat/finish/fail only touch a job still running under ``worker`` and
+    # return False once it has been reclaimed by another one
+
+    def heartbeat(self, job_id, worker, completed=None, total=None):
+        with self._lock:
+            conn = self._connect()
+            if completed is None:
+                cursor = conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = ?", (time.time(), job_id, worker, RUNNING))
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ?, completed = ?, total = ? WHERE id = ? AND worker = ? AND status = ?",
+                    (time.time(), completed, total, job_id, worker, RUNNING),
+                )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, result, total=None):
+        tmp_path = self.result_path(job_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, total = COALESCE(?, total), completed = COALESCE(?, total, completed) "
+                    "WHERE id = ? AND worker = ? AND status = ?",
+                    (SUCCEEDED, time.time(), total, total, job_id, worker, RUNNING),
+                )
+                if cursor.rowcount == 1:
+                    # Under the write lock, so a poll never sees the result of a job it still reports as running
+                    os.replace(tmp_path, self.result_path(job_id))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if cursor.rowcount != 1:
+            os.remove(tmp_path)
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (FAILED, error, time.time(), job_id, worker, RUNNING),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def purge(self, older_than):
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (SUCCEEDED, FAILED, older_than)).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        for row in rows:
+            shutil.rmtree(os.path.join(self.job_dir, row["id"]), ignore_errors=True)
+        if rows:
+            logger.info(f"Purged {len(rows)} expired jobs.")
+        return len(rows)
+
+
+def job_status(job):
+    total = job["total"]
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "source_language": job["source_language"],
+        "file_name": job["file_name"],
+        "status": job["status"],
+        "progress": {
+            "completed": job["completed"],
+            "total": total,
+            "percent": round(100 * job["completed"] / total, 1) if total else None
+        },
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result"
+    }
+
+
+async def run_job(store, job, progress):
+    kind, source_language = job["kind"], job["source_language"]
+    path = store.upload_path(job["id"])
+    if kind in ("pdf", "txt"):
+        with open(path, "rb") as f:
+            return await translate_document(kind, source_language, UploadFile(file=f, filename=job["file_name"]), progress, store.output_path(job["id"]))
+
+    with open(path, "rb") as f:
+        content = f.read()
+    if kind == "audio":
+        return await transcribe_audio_file(source_language, content, progress)
+    if kind == "audio_zip":
+        return await transcribe_audio_archive(source_language, content, progress)
+    return await transcribe_video_file(source_language, content, progress)
+
+
+class JobWorkerPool:
+    """``workers`` asyncio tasks per process pulling jobs from the shared store."""
+
+    def __init__(self, store, workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._running = {}
+
+    def start(self):
+        if self.workers <= 0:
+            return
+        self._tasks = [asyncio.ensure_future(self._worker(f"{os.getpid()}-{i}")) for i in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._housekeeping()))
+        logger.info(f"Started {self.workers} job workers in process {os.getpid()}.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, name):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, name)
+            except sqlite3.Error:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._run(job, name)
+
+    async def _run(self, job, worker):
+        job_id = job["id"]
+        logger.info(f"Running {job['kind']} job {job_id}.")
+        state = {"progress": None, "lost": False}
+
+        def progress(completed, total):
+            # Called from the pipelines on the loop; _heartbeat writes it
+            state["progress"] = (completed, total)
+
+        task = asyncio.ensure_future(run_job(self.store, job, progress))
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, worker, state, task))
+        self._running[job_id] = job
+        try:
+            result = await task
+            total = state["progress"][1] if state["progress"] else None
+            owned = await asyncio.to_thread(self.store.finish, job_id, worker, result, total)
+            logger.info(f"Job {job_id} succeeded." if owned else f"Job {job_id} finished after it was reclaimed, discarding the result.")
+        except asyncio.CancelledError:
+            if not state["lost"]:
+                raise
+            owned = False
+        except CircuitOpenError as e:
+            logger.error(f"Job {job_id} failed fast: {e}")
+            owned = await asyncio.to_thread(self.store.fail, job_id, worker, str(e))
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            owned = await asyncio.to_thread(self.store.fail, job_id, worker, str(e))
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+        if owned and job["webhook_url"]:
+            await notify_webhook(job["webhook_url"], job_status(await asyncio.to_thread(self.store.get, job_id)))
+
+    async def _heartbeat(self, job_id, worker, state, task):
+        # Writes progress at most every JOB_PROGRESS_INTERVAL and otherwise keeps
+        # the claim alive through long steps (transcoding, PDF extraction) that
+        # report none. Stops the job once another worker has reclaimed it.
+        written, last_write = None, time.monotonic()
+        while True:
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+            current = state["progress"]
+            if current == written and time.monotonic() - last_write < JOB_STALE_SECONDS / 3:
+                continue
+            try:
+                owned = await asyncio.to_thread(self.store.heartbeat, job_id, worker, *(current or (None, None)))
+            except sqlite3.Error:
+                logger.exception(f"Failed to record the heartbeat of job {job_id}")
+                continue
+            written, last_write = current, time.monotonic()
+            if not owned:
+                logger.warning(f"Job {job_id} was reclaimed from worker {worker}, stopping it.")
+                state["lost"] = True
+                task.cancel()
+                return
+
+    async def _housekeeping(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.store.purge, time.time() - JOB_RETENTION_SECONDS)
+            except sqlite3.Error:
+                logger.exception("Failed to purge expired jobs")
+            await asyncio.sleep(600)
+
+    async def stats(self):
+        return {"workers": self.workers, "running": len(self._running), "queued": await asyncio.to_thread(self.store.queued)}
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def validate_webhook_url(url):
+    """Raise ValueError unless ``url`` is somewhere this server may POST to.
+
+    Resolves the host, so call it off the event loop.
+    """
+    parsed = urlparse(url)
+    schemes = ("https", "http") if WEBHOOK_ALLOW_HTTP else ("https",)
+    if parsed.scheme not in schemes or not parsed.hostname:
+        raise ValueError(f"Webhook URL must be an absolute {' or '.join(schemes)} URL")
+    host = parsed.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise ValueError(f"Webhook host {host} is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 443, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"Webhook host {host} does not resolve") from e
+    if not all(_is_public(address) for address in addresses):
+        raise ValueError(f"Webhook host {host} resolves to a private or reserved address")
+
+async def notify_webhook(url, payload):
+    try:
+        # Checked again at delivery: the name may resolve differently by now
+        await asyncio.to_thread(validate_webhook_url, url)
+        response = await webhook_retry.call_async(lambda: http_client.post_async(url, json=payload, allow_redirects=False), idempotent=True, description=f"webhook {url}")
+        response.raise_for_status()
+        logger.info(f"Notified {url} of job {payload['job_id']} ({payload['status']}).")
+    except Exception as e:
+        logger.error(f"Webhook {url} for job {payload['job_id']} failed: {e}")
+
+
+job_store = JobStore(JOB_STORE_PATH, JOB_DIR)
+job_pool = JobWorkerPool(job_store)
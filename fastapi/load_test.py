@@ -0,0 +1,365 @@
+"""End-to-end load generator for the translation service.
+
+Starts mock_bhashini.py and the app under uvicorn (unless --base-url points at
+a running server), drives each endpoint with the files in test_data/ at the
+given concurrency and writes throughput, latency percentiles, error rate and
+peak server RSS per endpoint as JSON, by default to load_results/ next to this
+script (gitignored):
+
+    python load_test.py --concurrency 8 --requests 50 --scale 4 --output before.json
+    python load_test.py --endpoints text,pdf --compare before.json
+
+--scale N repeats the text payload N times and packs N copies of the sample
+file into the zip uploads, so the same run can be repeated at larger sizes.
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import asyncio
+import zipfile
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+import aiohttp
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_DATA = os.path.join(HERE, "..", "test_data")
+
+RESULTS_DIR = os.path.join(HERE, "load_results")
+
+ENDPOINTS = ["text", "pdf", "txt", "audio", "audio_zip", "video"]
+
+
+def _read(name):
+    with open(os.path.join(TEST_DATA, name), "rb") as f:
+        return f.read()
+
+def _zip_copies(name, copies):
+    stem, ext = os.path.splitext(name)
+    buffer = io.BytesIO()
+    content = _read(name)
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for i in range(copies):
+            zip_ref.writestr(f"{stem}_{i}{ext}", content)
+    return buffer.getvalue()
+
+
+def build_payloads(scale, language, files=None):
+    """Request builders per endpoint: ``(path, kwargs for aiohttp post)``."""
+    files = files or {}
+    text = _read("hello.txt").decode("utf-8")
+
+    def upload(field, file_name, content):
+        def make():
+            form = aiohttp.FormData()
+            form.add_field("source_language", language)
+            form.add_field(field, content, filename=file_name)
+            return {"data": form}
+        return make
+
+    def from_file(endpoint, field, default_name, default_content):
+        if endpoint in files:
+            path = files[endpoint]
+            with open(path, "rb") as f:
+                return upload(field, os.path.basename(path), f.read())
+        return upload(field, default_name, default_content)
+
+    if scale > 1:
+        pdf = from_file("pdf", "uploaded_file", "hindi.zip", _zip_copies("hindi.pdf", scale))
+        txt = from_file("txt", "uploaded_file", "hello.zip", _zip_copies("hello.txt", scale))
+    else:
+        pdf = from_file("pdf", "uploaded_file", "hindi.pdf", _read("hindi.pdf"))
+        txt = from_file("txt", "uploaded_file", "hello.txt", _read("hello.txt"))
+    return {
+        "text": ("/translate_text/", lambda: {"json": {"source_language": language, "text_content": "\n".join([text] * scale)}}),
+        "pdf": ("/translate_pdf/", pdf),
+        "txt": ("/translate_txt/", txt),
+        "audio": ("/translate_audio/", from_file("audio", "audio_file", "Hindi.flac", _read("Hindi.flac"))),
+        "audio_zip": ("/translate_audio_zip/", from_file("audio_zip", "zip_file", "audio.zip", _zip_copies("Hindi.flac", scale))),
+        "video": ("/translate_video/", from_file("video", "video_file", "test.mp4", _read("test.mp4"))),
+    }
+
+
+def _has_failure(node):
+    if isinstance(node, list):
+        return any(_has_failure(item) for item in node)
+    if not isinstance(node, dict):
+        return False
+    status_code, status = node.get("status_code"), node.get("status")
+    if node.get("error") or "result" in node and node["result"] is None:
+        return True
+    if isinstance(status_code, int) and status_code >= 400:
+        return True
+    # PDF/TXT chunk entries carry the upstream status with an empty translated_chunk
+    if isinstance(status, int) and not isinstance(status, bool) and status != 200:
+        return True
+    return any(_has_failure(value) for value in node.values())
+
+def _failed(status, body):
+    # The endpoints answer 200 and report upstream failures per chunk, file or
+    # segment inside the body, so look through all of it
+    return status >= 400 or _has_failure(body)
+
+
+async def run_endpoint(session, base_url, path, make_request, total, concurrency):
+    latencies, errors, status_codes = [], 0, {}
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                async with session.post(base_url + path, **make_request()) as response:
+                    status = response.status
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = None
+                failed = _failed(status, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                status, failed = "exception", True
+            latencies.append(time.perf_counter() - started)
+            status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, status_codes, elapsed
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies, errors, status_codes, elapsed, peak_rss):
+    count = len(latencies)
+    to_ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": to_ms(percentile(latencies, 0.50)),
+            "p95": to_ms(percentile(latencies, 0.95)),
+            "p99": to_ms(percentile(latencies, 0.99)),
+            "mean": to_ms(sum(latencies) / count) if count else None,
+            "max": to_ms(max(latencies)) if count else None,
+        },
+        "status_codes": status_codes,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss is not None else None,
+    }
+
+
+def _rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+class RSSSampler:
+    """Polls /proc for the resident set of a process tree (uvicorn workers included)."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tree_rss(self):
+        pids, total = [self.pid], 0
+        while pids:
+            pid = pids.pop()
+            total += _rss(pid)
+            pids.extend(_children(pid))
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid is not None and os.path.exists(f"/proc/{self.pid}"):
+            self.peak = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def result(self):
+        return self.peak if self._thread is not None else None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_ready(url, process, timeout=60):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+def start_stack(args):
+    """Launch the upstream stand-in and the app; returns (base_url, app pid, processes)."""
+    mock_port, app_port = _free_port(), _free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_args = [sys.executable, "mock_bhashini.py", "--port", str(mock_port)] + args.mock_args
+    mock = subprocess.Popen(mock_args, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_ready(mock_url + "/mock/stats", mock)
+
+    env = dict(os.environ,
+               ULCA_PIPELINE_URL=mock_url + "/ulca/apis/v0/model/getModelsPipeline",
+               BHASHINI_INFERENCE_URL=mock_url + "/services/inference/pipeline")
+    env.setdefault("TRANSLATION_MEMORY_ENABLED", "0")
+    # The ASR calls send this header; the mock accepts any value
+    env.setdefault("Authorization", "mock-asr-key")
+    app_args = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning"]
+    app = subprocess.Popen(app_args, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{app_port}"
+    _wait_ready(base_url + "/metrics/", app)
+    return base_url, app.pid, [app, mock]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline):
+    """Print per-endpoint deltas against an earlier results file."""
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')})")
+    for endpoint, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        deltas = []
+        for label, now, before in [
+            ("rps", current["throughput_rps"], previous["throughput_rps"]),
+            ("p50", current["latency_ms"]["p50"], previous["latency_ms"]["p50"]),
+            ("p95", current["latency_ms"]["p95"], previous["latency_ms"]["p95"]),
+            ("p99", current["latency_ms"]["p99"], previous["latency_ms"]["p99"]),
+            ("rss", current["peak_rss_mb"], previous["peak_rss_mb"]),
+        ]:
+            if now is not None and before:
+                deltas.append(f"{label} {(now - before) / before:+.1%}")
+        print(f"  {endpoint:<10} " + ", ".join(deltas))
+
+
+async def run(args, base_url, server_pid):
+    payloads = build_payloads(args.scale, args.language, dict(item.split("=", 1) for item in args.file))
+    results = {}
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        for endpoint in args.endpoints:
+            path, make_request = payloads[endpoint]
+            if args.warmup:
+                await run_endpoint(session, base_url, path, make_request, args.warmup, min(args.warmup, args.concurrency))
+            with RSSSampler(server_pid) as sampler:
+                latencies, errors, status_codes, elapsed = await run_endpoint(session, base_url, path, make_request, args.requests, args.concurrency)
+            results[endpoint] = summarize(latencies, errors, status_codes, elapsed, sampler.result())
+            summary = results[endpoint]
+            print(f"{endpoint:<10} {summary['throughput_rps']:>8.2f} req/s  p50 {summary['latency_ms']['p50']}ms  p95 {summary['latency_ms']['p95']}ms  "
+                  f"p99 {summary['latency_ms']['p99']}ms  errors {summary['error_rate']:.1%}  rss {summary['peak_rss_mb']}MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Run against an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from when using --base-url")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma separated subset of " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--language", default="hi")
+    parser.add_argument("--file", action="append", default=[], metavar="ENDPOINT=PATH", help="Upload PATH instead of the test_data sample")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the server")
+    parser.add_argument("--mock-args", default="", help="Extra mock_bhashini.py options, e.g. '--throttle-rate 0.05'")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="Results file (default: a timestamped file in load_results/)")
+    parser.add_argument("--compare", help="Earlier results file to diff against")
+    args = parser.parse_args()
+    args.endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    args.mock_args = args.mock_args.split()
+
+    processes = []
+    try:
+        if args.base_url:
+            base_url, server_pid = args.base_url.rstrip("/"), args.server_pid
+        else:
+            base_url, server_pid, processes = start_stack(args)
+        endpoints = asyncio.run(run(args, base_url, server_pid))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    commit, now = _git_commit(), datetime.now(timezone.utc)
+    results = {
+        "commit": commit,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {key: getattr(args, key) for key in ("endpoints", "concurrency", "requests", "warmup", "scale", "language", "workers", "mock_args")},
+        "endpoints": endpoints,
+    }
+    if args.output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        args.output = os.path.join(RESULTS_DIR, f"{now:%Y%m%dT%H%M%SZ}_{commit or 'unknown'}.json")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import threading
+import logging
+from logging.handlers import TimedRotatingFileHandler
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_handlers = {}
+_lock = threading.Lock()
+
+
+class _DailyFileHandler(TimedRotatingFileHandler):
+    def _open(self):
+        # Runs on the first record (delay=True), so the log directory is created then too
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def get_logger(name, log_filename, level=logging.INFO):
+    """The module logger writing to the daily-rotated ``log_filename``.
+
+    Handlers are created once per file. The file and its directory are only
+    created when the first record is written, so importing a module writes
+    nothing to disk, and re-imports never add a second handler.
+    """
+    with _lock:
+        handler = _handlers.get(log_filename)
+        if handler is None:
+            handler = _DailyFileHandler(log_filename, when="midnight", interval=1, backupCount=7, delay=True)
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            _handlers[log_filename] = handler
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    return logger
@@ -1,39 +1,156 @@
-import logging
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
 from pydantic import BaseModel
-from typing import List
-from fastapi.responses import JSONResponse
+from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
 from io import BytesIO
 import zipfile
 import os
-if not os.path.exists("logs/"):
-    os.makedirs("logs/")
+import math
+import json
+import threading
 
-from audio_utils import get_encoded_string, is_base64, delete_mp3_files
-from translation_utils import get_service_id, transcribe_and_translate, translate, get_languages, start_translation_pdf, start_translation_txt
-from video_utils import convert_videos_to_flac, delete_output_dirs
-from pdf_utils import delete_chunks_dirs, pdf_reader
-from txt_utils import txt_reader
+from translation_utils import translate_async, get_languages, prewarm_service_registry, service_registry, translation_governor, asr_governor, translation_retry, asr_retry, translation_hedger, asr_hedger
+from pipelines import transcribe_audio_file, transcribe_audio_archive, stream_audio_archive, translate_document, stream_document, transcribe_video_file
+from jobs import job_store, job_pool, job_status, validate_webhook_url, JOB_KINDS, JOB_MAX_QUEUED, SUCCEEDED
+from http_client import get_pool_stats, close_async_sessions
+from translation_memory import translation_memory
+from circuit_breaker import CircuitOpenError, circuit_breakers
 
-from logging.handlers import TimedRotatingFileHandler
+from logging_utils import get_logger
 
 
 
-log_filename = "logs/main.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
+logger = get_logger(__name__, "logs/main.log")
 
 
 app = FastAPI()
 
+@app.on_event("startup")
+def warm_service_registry():
+    # Resolve every language's pipeline config in the background so the
+    # first requests find it cached; concurrent lookups join the same call.
+    if os.getenv("SERVICE_REGISTRY_PREWARM", "1") == "1":
+        threading.Thread(target=prewarm_service_registry, daemon=True).start()
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_pool.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_pool.stop()
+
+@app.on_event("shutdown")
+async def close_http_sessions():
+    await close_async_sessions()
+
 class TextTranslationRequest(BaseModel):
     source_language: str
     text_content: str
 
+def circuit_open_response(e):
+    logger.error(f"Failing fast: {e}")
+    return JSONResponse(content={"error": str(e)}, status_code=503, headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def format_event(event, stream):
+    data = json.dumps(event, ensure_ascii=False)
+    if stream == "sse":
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+def streaming_response(source, file_name, stream):
+    """Stream the events of the async generator ``source`` as NDJSON or server-sent events."""
+    async def events():
+        try:
+            async for event in source:
+                yield format_event(event, stream)
+        except CircuitOpenError as e:
+            logger.error(f"Failing fast: {e}")
+            yield format_event({"event": "error", "error": str(e), "retry_after": math.ceil(e.retry_after)}, stream)
+        except Exception as e:
+            logger.exception(f"Error streaming translation of {file_name}")
+            yield format_event({"event": "error", "error": str(e)}, stream)
+
+    # The upload is read up front because the request is finished by the time the body streams
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[stream], headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def streaming_translation(kind, source_language, file_name, content, stream):
+    """Stream per-chunk results of a PDF/TXT upload as NDJSON or server-sent events."""
+    return streaming_response(stream_document(kind, source_language, UploadFile(file=BytesIO(content), filename=file_name)), file_name, stream)
+
+def check_stream(stream):
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format {stream}. Use one of: {', '.join(STREAM_MEDIA_TYPES)}.")
+
+@app.get("/metrics/")
+async def metrics():
+    return JSONResponse(content={
+        "http_pool": get_pool_stats(),
+        "service_registry": service_registry.stats(),
+        "translation_memory": translation_memory.stats(),
+        "rate_governors": {
+            "translation": translation_governor.stats(),
+            "asr": asr_governor.stats()
+        },
+        "retries": {
+            "translation": translation_retry.stats(),
+            "asr": asr_retry.stats()
+        },
+        "circuit_breakers": circuit_breakers.stats(),
+        "hedging": {
+            "translation": translation_hedger.stats(),
+            "asr": asr_hedger.stats()
+        },
+        "jobs": await job_pool.stats()
+    })
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(kind: str = Form(...), source_language: str = Form(...), uploaded_file: UploadFile = File(...), webhook_url: Optional[str] = Form(None)):
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind {kind}. Use one of: {', '.join(JOB_KINDS)}.")
+    if not uploaded_file.filename.endswith(JOB_KINDS[kind]):
+        raise HTTPException(status_code=400, detail=f"Invalid file format. Only {', '.join(JOB_KINDS[kind])} files are supported for {kind} jobs.")
+    if webhook_url:
+        try:
+            await run_in_threadpool(validate_webhook_url, webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if await run_in_threadpool(job_store.queued) >= JOB_MAX_QUEUED:
+        logger.error("Job queue is full")
+        return JSONResponse(content={"error": "Job queue is full, try again later"}, status_code=503, headers={"Retry-After": "60"})
+
+    job_id = await run_in_threadpool(job_store.create, kind, source_language, uploaded_file.filename, uploaded_file.file, webhook_url)
+    return JSONResponse(content=job_status(await run_in_threadpool(job_store.get, job_id)), status_code=202)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job_status(job))
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != SUCCEEDED:
+        return JSONResponse(content=job_status(job), status_code=409)
+    return FileResponse(job_store.result_path(job_id), media_type="application/json")
+
+@app.get("/jobs/{job_id}/chunks/{position}")
+async def get_job_chunk(job_id: str, position: int):
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    record = await run_in_threadpool(job_store.output_record, job_id, position)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Chunk {position} not translated yet")
+    return JSONResponse(content=record)
+
 @app.post("/translate_audio/")
 async def transcribe_audio(source_language: str = Form(...), audio_file: UploadFile = File(...)):
     try:
@@ -42,110 +159,86 @@ async def transcribe_audio(source_language: str = Form(...), audio_file: UploadF
             logger.error("Invalid file format. Only .flac files are supported.")
             raise HTTPException(status_code=400, detail="Invalid file format. Only .flac files are supported.")
         
-        encoded_string, wav_file_content = get_encoded_string(BytesIO(await audio_file.read()))
-        if is_base64(encoded_string):
-            service_id = get_service_id(source_language)
-            if service_id:
-                result = transcribe_and_translate(encoded_string, service_id, source_language)
-                logger.info(f"Transcription and translation successful for {audio_file.filename}")
-                delete_mp3_files("./")
-                return JSONResponse(content={"result": result})
-            else:
-                logger.error("Service ID not found")
-                raise HTTPException(status_code=400, detail="Service ID not found")
-        else:
-            logger.error("Invalid file format")
-            raise HTTPException(status_code=400, detail="Invalid file format")
+        result = await transcribe_audio_file(source_language, await audio_file.read())
+        logger.info(f"Transcription and translation successful for {audio_file.filename}")
+        return JSONResponse(content=result)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.exception("Error processing the audio file")
-        delete_mp3_files("./")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.post("/translate_audio_zip/")
-async def transcribe_audio_zip(source_language: str = Form(...), zip_file: UploadFile = File(...)):
+async def transcribe_audio_zip(source_language: str = Form(...), zip_file: UploadFile = File(...), stream: Optional[str] = Form(None)):
+    check_stream(stream)
     try:
         logger.info(f"Received ZIP file: {zip_file.filename} for source language: {source_language}")
         if not zip_file.filename.endswith(".zip"):
             logger.error("Invalid file format. Only .zip files are supported.")
             raise HTTPException(status_code=400, detail="Invalid file format. Only .zip files are supported.")
-        
-        results = []
-        with zipfile.ZipFile(BytesIO(await zip_file.read()), "r") as zip_ref:
-            for file_name in zip_ref.namelist():
-                if file_name.endswith(".flac"):
-                    with zip_ref.open(file_name) as file:
-                        audio_file = BytesIO(file.read())
-                        encoded_string, wav_file_content = get_encoded_string(audio_file)
-                        if is_base64(encoded_string):
-                            service_id = get_service_id(source_language)
-                            if service_id:
-                                result = transcribe_and_translate(encoded_string, service_id, source_language)
-                                results.append({"file_name": file_name, "result": result})
-                                logger.info(f"Transcription and translation successful for {file_name}")
-                            else:
-                                results.append({"file_name": file_name, "error": "Service ID not found"})
-                                logger.error(f"Service ID not found for {file_name}")
-                        else:
-                            results.append({"file_name": file_name, "error": "Invalid file format"})
-                            logger.error(f"Invalid file format for {file_name}")
-        delete_mp3_files("./")
-        return JSONResponse(content={"results": results})
+        if stream:
+            return streaming_response(stream_audio_archive(source_language, await zip_file.read()), zip_file.filename, stream)
+
+        return JSONResponse(content=await transcribe_audio_archive(source_language, await zip_file.read()))
     except zipfile.BadZipFile:
         logger.error("Invalid ZIP file")
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.exception("Error processing the ZIP file")
-        delete_mp3_files("./")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.post("/translate_text/")
 async def translate_text(request: TextTranslationRequest):
     try:
         logger.info(f"Received text translation request for source language: {request.source_language}")
-        result = translate(request.source_language, request.text_content)
+        result = await translate_async(request.source_language, request.text_content)
         logger.info("Text translation successful")
         return JSONResponse(content={"result": result})
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.exception("Error translating the text")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.post("/translate_pdf/")
-async def translate_pdf(source_language: str = Form(...), uploaded_file: UploadFile = File(...)):
+async def translate_pdf(source_language: str = Form(...), uploaded_file: UploadFile = File(...), stream: Optional[str] = Form(None)):
+    check_stream(stream)
     try:
         logger.info(f"Received PDF file: {uploaded_file.filename} for source language: {source_language}")
         if not (uploaded_file.filename.endswith(".pdf") or uploaded_file.filename.endswith(".zip")):
             logger.error("Invalid file format. Only .zip and .pdf files are supported.")
             raise HTTPException(status_code=400, detail="Invalid file format. Only .zip and .pdf files are supported.")
-        
-        delete_chunks_dirs()
-        _ = pdf_reader(uploaded_file)
-        
-        translation_results = start_translation_pdf(source_language)
-        delete_chunks_dirs()
+        if stream:
+            return streaming_translation("pdf", source_language, uploaded_file.filename, await uploaded_file.read(), stream)
+
+        translation_results = await translate_document("pdf", source_language, uploaded_file)
         logger.info("PDF translation successful")
         return JSONResponse(content=translation_results)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
-        delete_chunks_dirs()
         logger.exception("Error translating the PDF file")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 @app.post("/translate_txt/")
-async def translate_txt(source_language: str = Form(...), uploaded_file: UploadFile = File(...)):
+async def translate_txt(source_language: str = Form(...), uploaded_file: UploadFile = File(...), stream: Optional[str] = Form(None)):
+    check_stream(stream)
     try:
         logger.info(f"Received TXT file: {uploaded_file.filename} for source language: {source_language}")
         if not (uploaded_file.filename.endswith(".txt") or uploaded_file.filename.endswith(".zip")):
             logger.error("Invalid file format. Only .zip and .txt files are supported.")
             raise HTTPException(status_code=400, detail="Invalid file format. Only .zip and .txt files are supported.")
-        
-        delete_chunks_dirs()
-        _ = txt_reader(uploaded_file)
+        if stream:
+            return streaming_translation("txt", source_language, uploaded_file.filename, await uploaded_file.read(), stream)
 
-        translation_results = start_translation_txt(source_language)
-        delete_chunks_dirs()
+        translation_results = await translate_document("txt", source_language, uploaded_file)
         logger.info("TXT translation successful")
         return JSONResponse(content=translation_results)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
-        delete_chunks_dirs()
         logger.exception("Error translating the TXT file")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
@@ -157,28 +250,12 @@ async def transcribe_video(source_language: str = Form(...), video_file: UploadF
             logger.error("Invalid file format. Only .mp4 files are supported.")
             raise HTTPException(status_code=400, detail="Invalid file format. Only .mp4 files are supported.")
         
-        delete_output_dirs()
-        video_content = await video_file.read()
-        flac_files = convert_videos_to_flac([BytesIO(video_content)])
-        results = []
-        for flac_file in flac_files:
-            with open(flac_file, 'rb') as audio_file:
-                encoded_string, wav_file_content = get_encoded_string(audio_file)
-                if is_base64(encoded_string):
-                    service_id = get_service_id(source_language)
-                    if service_id:
-                        result = transcribe_and_translate(encoded_string, service_id, source_language)
-                        results.append({"result": result})
-                        logger.info(f"Transcription and translation successful for {video_file.filename}")
-                    else:
-                        results.append({"error": "Service ID not found"})
-                        logger.error("Service ID not found")
-                else:
-                    results.append({"error": "Invalid file format"})
-                    logger.error("Invalid file format")
-        return JSONResponse(content={"results": results})
+        result = await transcribe_video_file(source_language, await video_file.read())
+        logger.info(f"Transcription and translation successful for {video_file.filename}")
+        return JSONResponse(content=result)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
-        delete_output_dirs()
         logger.exception("Error processing the video file")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
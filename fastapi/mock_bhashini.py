@@ -0,0 +1,343 @@
+"""Local stand-in for the ULCA getModelsPipeline and Bhashini inference APIs.
+
+Serves the same JSON shapes translation_utils.py parses, with configurable
+latency, error and throttling behaviour, and can record real upstream
+responses once and replay them deterministically:
+
+    python mock_bhashini.py --port 9000 --translation-latency lognormal:0.4,0.5 --throttle-rate 0.02
+    ULCA_PIPELINE_URL=http://127.0.0.1:9000/ulca/apis/v0/model/getModelsPipeline \\
+    BHASHINI_INFERENCE_URL=http://127.0.0.1:9000/services/inference/pipeline \\
+    uvicorn main:app
+
+Every option can also be set through the MOCK_* environment variable of the
+same name, e.g. MOCK_TRANSLATION_LATENCY.
+
+Recorded cassettes have inferenceApiKey values and credential fields
+replaced by REDACTED and are gitignored; replays serve a mock key.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+if not os.path.exists("logs/"):
+    os.makedirs("logs/")
+
+import http_client
+
+ULCA_PATH = "/ulca/apis/v0/model/getModelsPipeline"
+INFERENCE_PATH = "/services/inference/pipeline"
+TRANSLATION_PATH = "/services/inference/translation"
+
+DEFAULTS = {
+    "mode": "synthetic",
+    "cassette": "cassettes/bhashini.jsonl",
+    "replay_miss": "synthetic",
+    "upstream_ulca_url": "https://meity-auth.ulcacontrib.org" + ULCA_PATH,
+    "upstream_inference_url": "https://dhruva-api.bhashini.gov.in" + INFERENCE_PATH,
+    "ulca_latency": "fixed:0.05",
+    "translation_latency": "lognormal:0.3,0.4",
+    "translation_seconds_per_kchar": "0.05",
+    "asr_latency": "lognormal:1.0,0.4",
+    "asr_seconds_per_mb": "0.5",
+    "error_rate": "0",
+    "throttle_rate": "0",
+    "max_concurrency": "0",
+    "unsupported": "translation:en",
+    "seed": "",
+}
+
+
+def load_config(overrides=None):
+    config = {key: os.getenv(f"MOCK_{key.upper()}", value) for key, value in DEFAULTS.items()}
+    config.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    return config
+
+
+class LatencyProfile:
+    """Latency distribution parsed from "<kind>:<params>".
+
+    fixed:s | uniform:low,high | normal:mean,sd | lognormal:median,sigma |
+    pareto:minimum,alpha | recorded (replay only: use the recorded latency)
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",") if value]
+
+    def sample(self, rng, recorded=None):
+        if self.kind == "recorded":
+            return recorded or 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * rng.lognormvariate(0, sigma)
+        if self.kind == "pareto":
+            minimum, alpha = self.params
+            return minimum * rng.paretovariate(alpha)
+        raise ValueError(f"Unknown latency profile {self.spec}")
+
+
+class Cassette:
+    """Append-only JSONL store of recorded upstream responses keyed by request hash."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(endpoint, body):
+        canonical = json.dumps(body, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{endpoint}\n{canonical}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def add(self, entry):
+        """Append ``entry``; its body must already be redacted."""
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Credentials never go into a cassette; replays hand out MOCK_INFERENCE_KEY instead
+SECRET_FIELDS = {"authorization", "userid", "ulcaapikey"}
+MOCK_INFERENCE_KEY = "mock-inference-key"
+REDACTED = "REDACTED"
+
+
+def redact(payload):
+    """Copy of a recorded JSON payload with API keys and credential headers blanked."""
+    if isinstance(payload, list):
+        return [redact(item) for item in payload]
+    if not isinstance(payload, dict):
+        return payload
+    redacted = {}
+    for name, value in payload.items():
+        if name.lower() in SECRET_FIELDS and isinstance(value, str):
+            redacted[name] = REDACTED
+        elif name == "inferenceApiKey" and isinstance(value, dict):
+            redacted[name] = {**value, "value": REDACTED}
+        else:
+            redacted[name] = redact(value)
+    return redacted
+
+def unredact(payload):
+    endpoint = payload.get("pipelineInferenceAPIEndPoint") if isinstance(payload, dict) else None
+    if not endpoint or not isinstance(endpoint.get("inferenceApiKey"), dict):
+        return payload
+    return {**payload, "pipelineInferenceAPIEndPoint": {**endpoint, "inferenceApiKey": {**endpoint["inferenceApiKey"], "value": MOCK_INFERENCE_KEY}}}
+
+
+def _fake_translation(text, target_language):
+    return f"[{target_language}] {text}"
+
+def _fake_transcript(audio_content):
+    digest = hashlib.sha256(audio_content.encode("ascii", "ignore")).hexdigest()[:8]
+    return f"transcript {digest} ({len(audio_content)} bytes)"
+
+
+class MockBhashini:
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config["seed"] or None)
+        self.latency = {
+            "ulca": LatencyProfile(config["ulca_latency"]),
+            "translation": LatencyProfile(config["translation_latency"]),
+            "asr": LatencyProfile(config["asr_latency"]),
+        }
+        self.error_rate = float(config["error_rate"])
+        self.throttle_rate = float(config["throttle_rate"])
+        self.max_concurrency = int(config["max_concurrency"])
+        self.unsupported = set(item for item in config["unsupported"].split(",") if item)
+        self.cassette = Cassette(config["cassette"]) if config["mode"] in ("record", "replay") else None
+        self.in_flight = 0
+        self.stats = {"requests": {}, "errors": 0, "throttled": 0, "recorded": 0, "replayed": 0, "replay_misses": 0}
+        # Real callback URLs seen while recording, by the service ID they serve
+        self.callback_urls = {}
+
+    def _count(self, endpoint):
+        self.stats["requests"][endpoint] = self.stats["requests"].get(endpoint, 0) + 1
+
+    def injected_failure(self):
+        if self.max_concurrency and self.in_flight > self.max_concurrency:
+            self.stats["throttled"] += 1
+            return JSONResponse({"detail": "Too many concurrent requests"}, status_code=429, headers={"Retry-After": "1"})
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429, headers={"Retry-After": "1"})
+        if roll < self.throttle_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return JSONResponse({"detail": "Internal server error"}, status_code=500)
+        return None
+
+    def synthetic_latency(self, endpoint, body):
+        latency = self.latency[endpoint].sample(self.rng)
+        if endpoint == "translation":
+            chars = sum(len(item.get("source", "")) for item in body.get("inputData", {}).get("input", []))
+            latency += chars / 1000 * float(self.config["translation_seconds_per_kchar"])
+        elif endpoint == "asr":
+            size = sum(len(item.get("audioContent", "")) for item in body.get("inputData", {}).get("audio", []))
+            latency += size / (1024 * 1024) * float(self.config["asr_seconds_per_mb"])
+        return latency
+
+    def models_pipeline(self, body, base_url):
+        task = body["pipelineTasks"][0]
+        language = task["config"]["language"]["sourceLanguage"]
+        if f"{task['taskType']}:{language}" in self.unsupported:
+            return 200, {"pipelineResponseConfig": []}
+        service_id = f"mock/{task['taskType']}-{language}"
+        return 200, {
+            "pipelineResponseConfig": [{"taskType": task["taskType"], "config": [{"serviceId": service_id, "language": task["config"]["language"]}]}],
+            "pipelineInferenceAPIEndPoint": {
+                "callbackUrl": base_url + TRANSLATION_PATH,
+                "inferenceApiKey": {"name": "Authorization", "value": MOCK_INFERENCE_KEY}
+            }
+        }
+
+    def inference(self, body):
+        tasks = body["pipelineTasks"]
+        target_language = tasks[-1]["config"]["language"].get("targetLanguage", "en")
+        if tasks[0]["taskType"] == "asr":
+            transcripts = [_fake_transcript(item.get("audioContent", "")) for item in body["inputData"]["audio"]]
+            pipeline_response = [{"taskType": "asr", "output": [{"source": text} for text in transcripts]}]
+            if len(tasks) > 1:
+                pipeline_response.append({"taskType": "translation", "output": [{"source": text, "target": _fake_translation(text, target_language)} for text in transcripts]})
+            return 200, {"pipelineResponse": pipeline_response}
+        outputs = [{"source": item["source"], "target": _fake_translation(item["source"], target_language)} for item in body["inputData"]["input"]]
+        return 200, {"pipelineResponse": [{"taskType": "translation", "output": outputs}]}
+
+    async def forward(self, endpoint, url, body, headers):
+        forwarded = {name: value for name, value in headers.items() if name.lower() not in ("host", "content-length", "accept-encoding", "connection")}
+        started = time.monotonic()
+        response = await http_client.post_async(url, json=body, headers=forwarded)
+        latency = time.monotonic() - started
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"detail": response.content.decode("utf-8", "replace")}
+        return response.status_code, payload, latency
+
+    async def handle(self, endpoint, request):
+        body = await request.json()
+        base_url = str(request.base_url).rstrip("/")
+        self._count(endpoint)
+        self.in_flight += 1
+        try:
+            failure = self.injected_failure()
+            if failure is not None:
+                await asyncio.sleep(self.synthetic_latency(endpoint, body) / 4)
+                return failure
+
+            if self.cassette is not None:
+                key = Cassette.key(endpoint, body)
+                if self.config["mode"] == "record":
+                    status, payload, latency = await self.forward(endpoint, self.upstream_url(endpoint, body), body, request.headers)
+                    self.cassette.add({"key": key, "endpoint": endpoint, "status": status, "latency": latency, "body": redact(payload)})
+                    self.stats["recorded"] += 1
+                    return JSONResponse(self.rewrite_callback(payload, base_url) if endpoint == "ulca" else payload, status_code=status)
+                entry = self.cassette.get(key)
+                if entry is not None:
+                    self.stats["replayed"] += 1
+                    await asyncio.sleep(self.latency[endpoint].sample(self.rng, entry.get("latency")))
+                    payload = self.rewrite_callback(unredact(entry["body"]), base_url) if endpoint == "ulca" else entry["body"]
+                    return JSONResponse(payload, status_code=entry["status"])
+                self.stats["replay_misses"] += 1
+                if self.config["replay_miss"] == "error":
+                    return JSONResponse({"detail": "No recorded response for this request"}, status_code=404)
+
+            await asyncio.sleep(self.synthetic_latency(endpoint, body))
+            status, payload = self.models_pipeline(body, base_url) if endpoint == "ulca" else self.inference(body)
+            return JSONResponse(payload, status_code=status)
+        finally:
+            self.in_flight -= 1
+
+    def upstream_url(self, endpoint, body):
+        if endpoint == "ulca":
+            return self.config["upstream_ulca_url"]
+        if endpoint == "translation":
+            service_id = body["pipelineTasks"][0]["config"].get("serviceId")
+            return self.callback_urls.get(service_id, self.config["upstream_inference_url"])
+        return self.config["upstream_inference_url"]
+
+    def rewrite_callback(self, payload, base_url):
+        """Point the pipeline callbackUrl at this server, remembering the real one."""
+        endpoint = payload.get("pipelineInferenceAPIEndPoint")
+        if not endpoint or not endpoint.get("callbackUrl"):
+            return payload
+        payload = json.loads(json.dumps(payload))
+        for config in payload.get("pipelineResponseConfig", []):
+            for model in config.get("config", []):
+                if endpoint["callbackUrl"] != base_url + TRANSLATION_PATH:
+                    self.callback_urls[model.get("serviceId")] = endpoint["callbackUrl"]
+        payload["pipelineInferenceAPIEndPoint"]["callbackUrl"] = base_url + TRANSLATION_PATH
+        return payload
+
+
+def create_app(config=None):
+    mock = MockBhashini(config or load_config())
+    app = FastAPI(title="Bhashini/ULCA mock")
+    app.state.mock = mock
+
+    @app.post(ULCA_PATH)
+    async def get_models_pipeline(request: Request):
+        return await mock.handle("ulca", request)
+
+    @app.post(INFERENCE_PATH)
+    async def inference_pipeline(request: Request):
+        body = await request.json()
+        return await mock.handle("asr" if body["pipelineTasks"][0]["taskType"] == "asr" else "translation", request)
+
+    @app.post(TRANSLATION_PATH)
+    async def translation_callback(request: Request):
+        return await mock.handle("translation", request)
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {**mock.stats, "in_flight": mock.in_flight, "cassette_entries": len(mock.cassette) if mock.cassette else 0, "config": mock.config}
+
+    @app.on_event("shutdown")
+    async def close_http_sessions():
+        await http_client.close_async_sessions()
+
+    return app
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    for key in DEFAULTS:
+        parser.add_argument("--" + key.replace("_", "-"), dest=key)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+    uvicorn.run(create_app(load_config(args)), host=host, port=port, log_level="warning")
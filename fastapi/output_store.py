@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/output_store.log")
+
+
+class ChunkOutputStore:
+    """Append-only JSONL log of translated chunks with an offset index.
+
+    Every chunk is written once as one line of ``path``; ``path + ".idx"``
+    holds ``[offset, length, chunk_id]`` per line so records can be read back
+    by position or chunk ID without scanning the log. Reopening an existing
+    store drops a torn last line, rebuilds any index entries that were lost
+    and keeps the records, so an interrupted job can skip what it already
+    translated. A chunk written twice (a retry) resolves to its last record.
+
+    ``readonly`` stores never modify the files and may be opened while another
+    process is appending.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.readonly = readonly
+        self._entries = []
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._data = self._index = None
+        if not readonly:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+        if not readonly:
+            self._data = open(path, "ab")
+            self._index = open(self.index_path, "a", encoding="utf-8")
+        self._reader = open(path, "rb") if os.path.exists(path) else None
+
+    def _load(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        indexed, index_intact = [], True
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        offset, length, chunk_id = json.loads(line)
+                    except ValueError:
+                        index_intact = False
+                        break
+                    if offset + length > size:
+                        index_intact = False
+                        break
+                    indexed.append((offset, length, chunk_id))
+        end = indexed[-1][0] + indexed[-1][1] if indexed else 0
+
+        # Records past the last index entry were written but not indexed
+        recovered, valid_end = [], end
+        if end < size:
+            with open(self.path, "rb") as f:
+                f.seek(end)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        chunk_id = json.loads(line)["id"]
+                    except (ValueError, KeyError):
+                        break
+                    recovered.append((valid_end, len(line), chunk_id))
+                    valid_end += len(line)
+
+        for position, (offset, length, chunk_id) in enumerate(indexed + recovered):
+            self._entries.append((offset, length))
+            self._positions[chunk_id] = position
+        if self.readonly:
+            return
+        if valid_end < size:
+            logger.warning(f"Dropping {size - valid_end} bytes of incomplete output at the end of {self.path}.")
+            os.truncate(self.path, valid_end)
+        if recovered or not index_intact:
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                for offset, length, chunk_id in indexed + recovered:
+                    f.write(json.dumps([offset, length, chunk_id], ensure_ascii=False) + "\n")
+        if self._entries:
+            logger.info(f"Reopened {self.path} with {len(self._entries)} records.")
+
+    def append(self, chunk_id, record):
+        line = (json.dumps({"id": chunk_id, **record}, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(line)
+            self._data.flush()
+            self._index.write(json.dumps([offset, len(line), chunk_id], ensure_ascii=False) + "\n")
+            self._index.flush()
+            self._positions[chunk_id] = len(self._entries)
+            self._entries.append((offset, len(line)))
+
+    def read(self, position):
+        """The ``position``-th record written, counting from 0."""
+        offset, length = self._entries[position]
+        if self._reader is None:
+            self._reader = open(self.path, "rb")
+        return json.loads(os.pread(self._reader.fileno(), length, offset))
+
+    def get(self, chunk_id):
+        position = self._positions.get(chunk_id)
+        return self.read(position) if position is not None else None
+
+    def records(self):
+        for position in range(len(self._entries)):
+            yield self.read(position)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        for f in (self._data, self._index, self._reader):
+            if f is not None:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,23 +1,11 @@
 import os
 import zipfile
-import shutil
-import pickle
-from pdfminer.high_level import extract_text
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+from chunk_store import make_chunks, member_name
 from concurrent.futures import ThreadPoolExecutor
 import tempfile
-import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging_utils import get_logger
 
-# Configure logging
-log_filename = "logs/pdf_processing.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
+logger = get_logger(__name__, "logs/pdf_processing.log")
 
 
 def is_zipfile(file_path):
@@ -39,6 +27,7 @@ def unzip_folder(zip_path, output_folder):
 
 def split_docs(documents, chunk_size=4000, chunk_overlap=300):
     try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
         docs = text_splitter.split_text(documents)
         logger.info(f"Split documents into {len(docs)} chunks.")
@@ -47,49 +36,32 @@ def split_docs(documents, chunk_size=4000, chunk_overlap=300):
         logger.exception(f"Error splitting documents. Error: {e}")
         return []
 
-def process_pdf(pdf_path, pdf_chunk_dir="pdf_chunks", processed_pdfs_folder="processed_pdfs"):
+def read_pdf(pdf_path, filename, language=None):
+    """Chunks of the PDF's text, or None if it could not be read."""
     try:
-        metadata = []
-        docs = []
-        docObjs = []
+        from pdfminer.high_level import extract_text
         content = extract_text(pdf_path)
         logger.info(f"Extracted text from {pdf_path}.")
-
-        if not os.path.exists(processed_pdfs_folder):
-            os.makedirs(processed_pdfs_folder)
-
-        filename = os.path.basename(pdf_path)
-        temp = {'filename': filename}
-        temp['date_filename'] = True
-
-        chunks = split_docs(content)
-        num = len(chunks)
-        data = [temp for _ in range(num)]
-        metadata.extend(data)
-        docs.extend(chunks)
-
-        for j in range(num):
-            doc_data = docs[j]
-            doc_info = metadata[j]
-            doc_obj = Document(page_content=doc_data, metadata=doc_info)
-            docObjs.append(doc_obj)
-
-        if not os.path.exists(pdf_chunk_dir):
-            os.makedirs(pdf_chunk_dir)
-
-        pickle_file = os.path.join(pdf_chunk_dir, f"{filename}.pkl")
-        with open(pickle_file, 'wb') as file:
-            pickle.dump(docObjs, file)
-
-        shutil.move(pdf_path, processed_pdfs_folder)
-        logger.info(f"Processed and moved {pdf_path} to {processed_pdfs_folder}.")
-
-        return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docObjs]
+        return make_chunks(filename, content, split_docs(content), language)
     except Exception as e:
         logger.exception(f"Error processing PDF {pdf_path}. Error: {e}")
+        return None
+
+def add_chunks(chunk_store, filename, docObjs):
+    # The ".pkl" suffix is kept because result keys and source_file use it
+    chunk_store.add(f"{filename}.pkl", docObjs)
+    logger.info(f"Processed {filename} into {len(docObjs)} chunks.")
+
+def process_pdf(pdf_path, chunk_store, filename=None):
+    filename = filename or os.path.basename(pdf_path)
+    docObjs = read_pdf(pdf_path, filename, chunk_store.language)
+    if docObjs is None:
         return []
+    add_chunks(chunk_store, filename, docObjs)
+    return docObjs
 
 def get_pdf_files(root_directory):
+    """PDFs under ``root_directory`` sorted by path, so a zip is always read in the same order."""
     pdf_files = []
     try:
         for root, dirs, files in os.walk(root_directory):
@@ -99,21 +71,12 @@ def get_pdf_files(root_directory):
         logger.info(f"Found {len(pdf_files)} PDF files in {root_directory}.")
     except Exception as e:
         logger.exception(f"Error getting PDF files from {root_directory}. Error: {e}")
-    return pdf_files
-
-def delete_chunks_dirs():
-    try:
-        for directory in ["pdf_chunks", "processed_pdfs", "txt_chunks", "processed_txts", "english_chunks"]:
-            if os.path.exists(directory):
-                shutil.rmtree(directory)
-                logger.info(f"Deleted directory {directory}.")
-    except Exception as e:
-        logger.exception(f"Error deleting chunk directories. Error: {e}")
+    return sorted(pdf_files)
 
-def pdf_reader(file):
+def pdf_reader(file, chunk_store, workdir=None):
     results = []
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(dir=workdir) as temp_dir:
             file_location = os.path.join(temp_dir, file.filename)
             with open(file_location, "wb") as f:
                 f.write(file.file.read())
@@ -126,13 +89,18 @@ def pdf_reader(file):
                 pdf_files = get_pdf_files(output_folder)
                 num_workers = 5
 
+                names = [member_name(pdf_file, output_folder) for pdf_file in pdf_files]
+                # Extract in parallel but add in member order, so chunk order does not depend on thread timing
                 with ThreadPoolExecutor(max_workers=num_workers) as executor:
-                    futures = [executor.submit(process_pdf, pdf_file) for pdf_file in pdf_files]
-                    results = [future.result() for future in futures]
+                    extracted = list(executor.map(read_pdf, pdf_files, names, [chunk_store.language] * len(pdf_files)))
+                for name, docObjs in zip(names, extracted):
+                    if docObjs is not None:
+                        add_chunks(chunk_store, name, docObjs)
+                results = [docObjs or [] for docObjs in extracted]
                 logger.info(f"Processed zip file {file.filename} with {len(pdf_files)} PDFs.")
             else:
                 if file_location.lower().endswith('.pdf'):
-                    result = process_pdf(file_location)
+                    result = process_pdf(file_location, chunk_store)
                     results = [result]
                     logger.info(f"Processed single PDF file {file.filename}.")
                 else:
@@ -0,0 +1,319 @@
+import os
+import time
+import zlib
+import base64
+import asyncio
+import zipfile
+import subprocess
+from io import BytesIO
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from logging_utils import get_logger
+
+from segmentation import split_audio
+from translation_utils import get_service_id_async, transcribe_and_translate_async, transcribe_and_translate_batch_async, translate_chunks_async, stream_translation, RESULT_FIELDS
+from video_utils import convert_videos_to_flac
+from pdf_utils import pdf_reader
+from txt_utils import txt_reader
+from chunk_store import ChunkStore
+from output_store import ChunkOutputStore
+from workspace import open_workspace
+
+logger = get_logger(__name__, "logs/pipelines.log")
+
+# Every pipeline run gets its own workspace, so runs never see each other's files
+DOCUMENT_READERS = {
+    "pdf": pdf_reader,
+    "txt": txt_reader,
+}
+
+# ASR calls one recording may have in flight; asr_governor still caps the process
+ASR_MAX_IN_FLIGHT = int(os.getenv("ASR_MAX_IN_FLIGHT", "8"))
+# Budget for packing an archive's clips into one ASR request (FLAC bytes before
+# base64, seconds of audio, clips); ASR_BATCH_SIZE=1 sends every clip on its own
+ASR_BATCH_BYTES = int(os.getenv("ASR_BATCH_BYTES", str(4 * 1024 * 1024)))
+ASR_BATCH_SECONDS = float(os.getenv("ASR_BATCH_SECONDS", "120"))
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "16"))
+# Archive members decoded at once while earlier ones are being transcribed
+AUDIO_DECODE_WORKERS = int(os.getenv("AUDIO_DECODE_WORKERS", str(os.cpu_count() or 2)))
+# Archive members decoded but not yet fully transcribed; bounds how far
+# decoding runs ahead of ASR and so the decoded audio held in memory
+AUDIO_DECODE_LOOKAHEAD = int(os.getenv("AUDIO_DECODE_LOOKAHEAD", "64"))
+# What transcribe_audio_archive keeps of each file event
+ARCHIVE_RESULT_FIELDS = ("file_name", "result", "segments", "error")
+
+
+def _report(progress, completed, total):
+    if progress is not None:
+        progress(completed, total)
+
+async def _split_audio(content, workdir):
+    """Segments of ``content``, or None if it is not readable audio."""
+    try:
+        return await run_in_threadpool(split_audio, content, workdir)
+    except RuntimeError as e:
+        logger.error(f"Invalid file format: {e}")
+        return None
+
+def _read_and_split(zip_ref, name, workdir):
+    with zip_ref.open(name) as file:
+        return split_audio(file.read(), workdir)
+
+def _segment_text(result):
+    try:
+        asr, translation = result["pipelineResponse"][0], result["pipelineResponse"][1]
+        return asr["output"][0]["source"], translation["output"][0]["target"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def stitch_segments(segments, results):
+    """Join per-segment results, in order, into one response of the upstream shape plus timestamps."""
+    entries, sources, targets = [], [], []
+    for segment, result in zip(segments, results):
+        entry = {"index": segment.index, "start": round(segment.start, 2), "end": round(segment.end, 2)}
+        text = _segment_text(result)
+        if text is None:
+            entry["error"] = "Transcription failed"
+        else:
+            entry["source"], entry["target"] = text
+            sources.append(text[0])
+            targets.append(text[1])
+        entries.append(entry)
+    source, target = " ".join(sources), " ".join(targets)
+    return {
+        "result": {
+            "pipelineResponse": [
+                {"taskType": "asr", "output": [{"source": source}]},
+                {"taskType": "translation", "output": [{"source": source, "target": target}]}
+            ]
+        },
+        "segments": entries
+    }
+
+def _segments_response(segments, results):
+    if len(segments) == 1:
+        return {"result": results[0]}
+    return stitch_segments(segments, results)
+
+def pack_segments(segments, max_bytes=ASR_BATCH_BYTES, max_seconds=ASR_BATCH_SECONDS, max_items=ASR_BATCH_SIZE):
+    """Split ``segments`` into consecutive ``(start, end)`` ranges that each fit one ASR request.
+
+    A segment over budget on its own still gets a range to itself.
+    """
+    ranges, start, size, seconds = [], 0, 0, 0.0
+    for end, segment in enumerate(segments):
+        duration = segment.end - segment.start
+        if end > start and (size + len(segment.audio) > max_bytes or seconds + duration > max_seconds or end - start >= max_items):
+            ranges.append((start, end))
+            start, size, seconds = end, 0, 0.0
+        size += len(segment.audio)
+        seconds += duration
+    if start < len(segments):
+        ranges.append((start, len(segments)))
+    return ranges
+
+async def transcribe_segments(segments, service_id, source_language, progress=None):
+    """Transcribe and translate ``segments`` concurrently. A single segment keeps the upstream response as is."""
+    semaphore = asyncio.Semaphore(ASR_MAX_IN_FLIGHT)
+    completed = 0
+
+    async def run(segment):
+        nonlocal completed
+        async with semaphore:
+            result = await transcribe_and_translate_async(base64.b64encode(segment.audio).decode("ascii"), service_id, source_language)
+        completed += 1
+        _report(progress, completed, len(segments))
+        return result
+
+    tasks = [asyncio.ensure_future(run(segment)) for segment in segments]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # One segment failing hard (open circuit) makes the rest pointless
+        for task in tasks:
+            task.cancel()
+    return _segments_response(segments, results)
+
+async def transcribe_audio_file(source_language, content, progress=None):
+    async with open_workspace() as workspace:
+        segments = await _split_audio(content, workspace.root)
+    if segments is None:
+        raise HTTPException(status_code=400, detail="Invalid file format")
+    service_id = await get_service_id_async(source_language)
+    if not service_id:
+        logger.error("Service ID not found")
+        raise HTTPException(status_code=400, detail="Service ID not found")
+    return await transcribe_segments(segments, service_id, source_language, progress)
+
+async def stream_audio_archive(source_language, content, max_in_flight=ASR_MAX_IN_FLIGHT):
+    """Yield one event per FLAC in the archive as soon as it is transcribed, then a summary event.
+
+    Members are decoded and split AUDIO_DECODE_WORKERS at a time while
+    earlier ones are being transcribed, at most AUDIO_DECODE_LOOKAHEAD
+    members ahead of the last file event. Their segments, across files, are
+    packed into ASR requests (see pack_segments) as they become ready; a
+    batch is only sent short once nothing else is being decoded.
+    """
+    started = time.monotonic()
+    time_to_first_result = None
+    completed = failed = 0
+    service_id = await get_service_id_async(source_language)
+    decode_slots = asyncio.Semaphore(AUDIO_DECODE_WORKERS)
+    request_slots = asyncio.Semaphore(max_in_flight)
+
+    async with open_workspace() as workspace:
+        with zipfile.ZipFile(BytesIO(content), "r") as zip_ref:
+            names = [file_name for file_name in zip_ref.namelist() if file_name.endswith(".flac")]
+            total = len(names)
+            # Per member from its decode until its event is yielded
+            files, results, remaining = {}, {}, {}
+
+            async def decode(position):
+                # Decompressing the member is CPU work too, so it runs on the pool with the split
+                async with decode_slots:
+                    try:
+                        return position, await run_in_threadpool(_read_and_split, zip_ref, names[position], workspace.root), None
+                    except RuntimeError as e:
+                        logger.error(f"Invalid file format for {names[position]}: {e}")
+                        return position, None, "Invalid file format"
+                    except (subprocess.TimeoutExpired, OSError, zipfile.BadZipFile, zlib.error) as e:
+                        # One bad member must not cancel the rest of the archive
+                        logger.error(f"Could not decode {names[position]}: {e!r}")
+                        return position, None, "Audio decoding failed"
+
+            async def transcribe(batch):
+                async with request_slots:
+                    batch_results = await transcribe_and_translate_batch_async([base64.b64encode(segment.audio).decode("ascii") for _, segment in batch], service_id, source_language)
+                return batch, batch_results
+
+            def event(position, response):
+                nonlocal completed, failed, time_to_first_result
+                completed += 1
+                failed += "error" in response or any(result is None for result in results.get(position) or ())
+                elapsed = time.monotonic() - started
+                if time_to_first_result is None:
+                    time_to_first_result = elapsed
+                return {"event": "file", "index": position, "file_name": names[position], **response, "completed": completed, "total": total, "elapsed": round(elapsed, 3)}
+
+            if not service_id:
+                logger.error(f"Service ID not found for {source_language}")
+                for position in range(total):
+                    yield event(position, {"error": "Service ID not found"})
+
+            decodes, requests, ready = set(), set(), []
+            scheduled = active = 0
+            try:
+                while True:
+                    while service_id and scheduled < total and active < AUDIO_DECODE_LOOKAHEAD:
+                        decodes.add(asyncio.ensure_future(decode(scheduled)))
+                        scheduled += 1
+                        active += 1
+                    # Send every full batch; the last one may still fill up while decodes are pending
+                    ranges = pack_segments([segment for _, segment in ready])
+                    if decodes:
+                        ranges = ranges[:-1]
+                    for start, end in ranges:
+                        requests.add(asyncio.ensure_future(transcribe(ready[start:end])))
+                    if ranges:
+                        ready = ready[ranges[-1][1]:]
+                    if not decodes and not requests:
+                        break
+
+                    done, _ = await asyncio.wait(decodes | requests, return_when=asyncio.FIRST_COMPLETED)
+                    finished = []
+                    for task in done:
+                        if task in decodes:
+                            decodes.discard(task)
+                            position, segments, error = task.result()
+                            if segments is None:
+                                finished.append((position, {"error": error}))
+                                continue
+                            files[position], results[position], remaining[position] = segments, [None] * len(segments), len(segments)
+                            ready.extend((position, segment) for segment in segments)
+                            continue
+                        requests.discard(task)
+                        batch, batch_results = task.result()
+                        for (position, segment), result in zip(batch, batch_results):
+                            results[position][segment.index] = result
+                            remaining[position] -= 1
+                            if remaining[position] == 0:
+                                logger.info(f"Transcription and translation successful for {names[position]}")
+                                finished.append((position, _segments_response(files[position], results[position])))
+
+                    active -= len(finished)
+                    for position, response in finished:
+                        yield event(position, response)
+                        files.pop(position, None)
+                        results.pop(position, None)
+                        remaining.pop(position, None)
+            finally:
+                # The client went away or a request failed hard (open circuit)
+                for task in decodes | requests:
+                    task.cancel()
+
+    yield {
+        "event": "done",
+        "completed": completed,
+        "failed": failed,
+        "total": total,
+        "time_to_first_result": round(time_to_first_result, 3) if time_to_first_result is not None else None,
+        "elapsed": round(time.monotonic() - started, 3)
+    }
+
+async def transcribe_audio_archive(source_language, content, progress=None):
+    """Run stream_audio_archive to the end and return the files' results in archive order."""
+    responses = {}
+    async for event in stream_audio_archive(source_language, content):
+        if event["event"] == "file":
+            responses[event["index"]] = {key: event[key] for key in ARCHIVE_RESULT_FIELDS if key in event}
+            _report(progress, event["completed"], event["total"])
+    return {"results": [responses[position] for position in sorted(responses)]}
+
+async def translate_document(kind, source_language, upload, progress=None, output_path=None):
+    """Run the PDF or TXT pipeline on ``upload`` (anything with .filename and .file).
+
+    Translated chunks are appended to ``output_path`` (a workspace file by
+    default); chunks an earlier run already recorded there are not sent again.
+    """
+    if progress is not None:
+        translation_results = {}
+        async for event in stream_document(kind, source_language, upload, output_path):
+            if event["event"] == "chunk":
+                translation_results[event["id"]] = {key: event[key] for key in RESULT_FIELDS}
+                progress(event["completed"], event["total"])
+        return translation_results
+
+    async with open_workspace() as workspace:
+        chunk_store = ChunkStore(spill_dir=workspace.chunks, language=source_language)
+        _ = await run_in_threadpool(DOCUMENT_READERS[kind], upload, chunk_store, workspace.root)
+        with ChunkOutputStore(output_path or workspace.translations) as output_store:
+            return await translate_chunks_async(source_language, chunk_store, output_store)
+
+async def stream_document(kind, source_language, upload, output_path=None):
+    """Like translate_document, but yields the per-chunk events as they arrive."""
+    async with open_workspace() as workspace:
+        chunk_store = ChunkStore(spill_dir=workspace.chunks, language=source_language)
+        _ = await run_in_threadpool(DOCUMENT_READERS[kind], upload, chunk_store, workspace.root)
+        with ChunkOutputStore(output_path or workspace.translations) as output_store:
+            async for event in stream_translation(source_language, chunk_store, output_store):
+                yield event
+
+async def transcribe_video_file(source_language, content, progress=None):
+    results = []
+    service_id = await get_service_id_async(source_language)
+    async with open_workspace() as workspace:
+        flac_files = await run_in_threadpool(convert_videos_to_flac, [BytesIO(content)], workspace.outputs)
+        for flac_file in flac_files:
+            with open(flac_file, 'rb') as audio_file:
+                segments = await _split_audio(audio_file.read(), workspace.root)
+            if segments is None:
+                results.append({"error": "Invalid file format"})
+                logger.error("Invalid file format")
+            elif not service_id:
+                results.append({"error": "Service ID not found"})
+                logger.error("Service ID not found")
+            else:
+                results.append(await transcribe_segments(segments, service_id, source_language))
+                logger.info("Transcription and translation successful for video audio track")
+            _report(progress, len(results), len(flac_files))
+    return {"results": results}
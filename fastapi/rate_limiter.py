@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+import threading
+import contextlib
+from collections import deque
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/rate_limiter.log")
+
+# Upstream answers that mean "slow down" rather than "this request is wrong"
+CONGESTION_STATUS_CODES = {429, 502, 503, 504}
+
+
+class TokenBucket:
+    """Requests-per-second limiter; ``reserve`` never blocks, it returns the wait."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def tokens(self):
+        with self._lock:
+            return self._tokens
+
+
+class _Waiter:
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by one per window of successes and is
+    cut multiplicatively on throttling, server errors or slow responses.
+
+    Callers queue FIFO; a freed slot is handed straight to the oldest waiter,
+    which may be on another thread's event loop.
+    """
+
+    def __init__(self, initial, minimum, maximum, latency_target, decrease_factor=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _grant(self):
+        # Called with the lock held whenever a slot frees up or the limit grows
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            except RuntimeError:
+                # Its event loop is gone, so nobody is waiting any more
+                waiter.granted = False
+                self.in_flight -= 1
+
+    async def acquire_async(self):
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # Handed a slot just as we were cancelled; pass it on
+                    self.in_flight -= 1
+                    self._grant()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency, status_code):
+        with self._lock:
+            self.in_flight -= 1
+            congested = status_code is None or status_code in CONGESTION_STATUS_CODES or latency > self.latency_target
+            now = time.monotonic()
+            if congested:
+                # Responses already in flight when we backed off report the same
+                # congestion; only cut once per latency target window.
+                if now - self._last_decrease > min(latency, self.latency_target):
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    logger.warning(f"Congestion (status {status_code}, {latency:.2f}s), concurrency limit now {self.limit:.1f}.")
+            elif status_code < 400:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._grant()
+
+    def cancel(self):
+        """Give back a slot whose request was abandoned, without adjusting the limit."""
+        with self._lock:
+            self.in_flight -= 1
+            self._grant()
+
+    def waiting(self):
+        with self._lock:
+            return len(self._waiters)
+
+
+class Permit:
+    def __init__(self):
+        self.status_code = None
+        self.cancelled = False
+
+
+class RateGovernor:
+    """Token bucket plus AIMD concurrency in front of one upstream call type.
+
+    Callers set ``permit.status_code`` from the upstream response; a permit
+    released without one (timeout, connection error) counts as congestion.
+    A slot left through cancellation (the caller went away) counts as nothing.
+    """
+
+    def __init__(self, name, rate, burst, initial, minimum, maximum, latency_target):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(initial, minimum, maximum, latency_target)
+        self._stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name, prefix, rate=10, initial=4, maximum=32):
+        # Limits are per worker process; divide the upstream quota by --workers
+        return cls(
+            name,
+            rate=float(os.getenv(f"{prefix}_RATE_PER_SEC", str(rate))),
+            burst=float(os.getenv(f"{prefix}_BURST", str(rate))),
+            initial=int(os.getenv(f"{prefix}_INITIAL_CONCURRENCY", str(initial))),
+            minimum=int(os.getenv(f"{prefix}_MIN_CONCURRENCY", "1")),
+            maximum=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(maximum))),
+            latency_target=float(os.getenv(f"{prefix}_LATENCY_TARGET", "15")),
+        )
+
+    def _finish(self, permit, started, waited):
+        if permit.cancelled:
+            self.limiter.cancel()
+        else:
+            self.limiter.release(time.monotonic() - started, permit.status_code)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["wait_seconds"] += waited
+            if permit.status_code == 429:
+                self._stats["throttled"] += 1
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self):
+        queued = time.monotonic()
+        await asyncio.sleep(self.bucket.reserve())
+        await self.limiter.acquire_async()
+        started = time.monotonic()
+        permit = Permit()
+        try:
+            yield permit
+        except (asyncio.CancelledError, GeneratorExit):
+            permit.cancelled = True
+            raise
+        finally:
+            self._finish(permit, started, started - queued)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["concurrency_limit"] = round(self.limiter.limit, 2)
+        stats["in_flight"] = self.limiter.in_flight
+        stats["waiting"] = self.limiter.waiting()
+        stats["tokens"] = round(self.bucket.tokens(), 2)
+        return stats
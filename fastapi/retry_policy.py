@@ -0,0 +1,201 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+import aiohttp
+import requests
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/retry_policy.log")
+
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for idempotent upstream calls.
+
+    ``send`` returns a response with ``status_code`` and ``headers`` or raises;
+    a retryable status or connection error is retried until ``max_attempts``.
+    Calls not marked idempotent are never retried.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0, retry_after_cap=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_after_cap = retry_after_cap
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "exhausted": 0}
+
+    @classmethod
+    def from_env(cls, prefix):
+        return cls(
+            max_attempts=int(os.getenv(f"{prefix}_RETRY_ATTEMPTS", "4")),
+            base_delay=float(os.getenv(f"{prefix}_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv(f"{prefix}_RETRY_MAX_DELAY", "20")),
+        )
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_after_cap))
+        return delay
+
+    def _next_delay(self, attempt, response=None, error=None):
+        """Delay before the next attempt, or None if the outcome is final."""
+        if attempt + 1 >= self.max_attempts:
+            if error is not None or response.status_code in RETRY_STATUS_CODES:
+                self._count("exhausted")
+            return None
+        if error is not None:
+            return self.backoff(attempt)
+        if response.status_code not in RETRY_STATUS_CODES:
+            return None
+        return self.backoff(attempt, parse_retry_after(response.headers.get("Retry-After")))
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def call(self, send, idempotent=False, description="upstream call"):
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                response, error = send(), None
+            except RETRYABLE_EXCEPTIONS as e:
+                response, error = None, e
+            delay = self._next_delay(attempt, response, error) if idempotent else None
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            logger.warning(f"Retrying {description} in {delay:.2f}s after attempt {attempt + 1}: {error!r}" if error is not None else f"Retrying {description} in {delay:.2f}s after HTTP {response.status_code} on attempt {attempt + 1}.")
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, send, idempotent=False, description="upstream call"):
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                response, error = await send(), None
+            except RETRYABLE_EXCEPTIONS as e:
+                response, error = None, e
+            delay = self._next_delay(attempt, response, error) if idempotent else None
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            logger.warning(f"Retrying {description} in {delay:.2f}s after attempt {attempt + 1}: {error!r}" if error is not None else f"Retrying {description} in {delay:.2f}s after HTTP {response.status_code} on attempt {attempt + 1}.")
+            self._count("retries")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class Hedger:
+    """Send a duplicate request when the first one outlives the recent p95.
+
+    Hedging starts after ``min_samples`` latencies have been observed and is
+    capped at ``budget`` of all calls so a slow upstream is not doubled.
+    """
+
+    def __init__(self, enabled=False, percentile=0.95, window=500, min_samples=20, budget=0.1):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_env(cls, prefix):
+        return cls(
+            enabled=os.getenv(f"{prefix}_HEDGE", "0") == "1",
+            percentile=float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", "0.95")),
+            budget=float(os.getenv(f"{prefix}_HEDGE_BUDGET", "0.1")),
+        )
+
+    def _record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None if this call should not hedge."""
+        with self._lock:
+            self._stats["calls"] += 1
+            if not self.enabled or len(self._latencies) < self.min_samples:
+                return None
+            if self._stats["hedged"] >= self.budget * self._stats["calls"]:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile))]
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    async def _timed_async(self, send):
+        started = time.monotonic()
+        response = await send()
+        self._record(time.monotonic() - started)
+        return response
+
+    async def call_async(self, send):
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed_async(send)
+
+        first = asyncio.ensure_future(self._timed_async(send))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        self._count("hedged")
+        logger.info(f"Request exceeded p{int(self.percentile * 100)} ({delay:.2f}s), sending hedge.")
+        second = asyncio.ensure_future(self._timed_async(send))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    if task.exception() is None or not pending:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats["enabled"] = self.enabled
+        if latencies:
+            stats["p95_seconds"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+        return stats
@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from logging_utils import get_logger
+from audio_utils import AUDIO_SAMPLE_RATE, decode_to_pcm, encode_pcm_flac, flac_stream_info, is_conformant_flac
+
+logger = get_logger(__name__, "logs/segmentation.log")
+
+# Segments sent to ASR are at most this long; shorter recordings go in one piece
+AUDIO_SEGMENT_MAX_SECONDS = float(os.getenv("AUDIO_SEGMENT_MAX_SECONDS", "30"))
+# Cuts closer than this to the previous one are not considered
+AUDIO_SEGMENT_MIN_SECONDS = float(os.getenv("AUDIO_SEGMENT_MIN_SECONDS", "5"))
+# Frames quieter than this (dBFS RMS) count as silence
+AUDIO_SILENCE_DB = float(os.getenv("AUDIO_SILENCE_DB", "-40"))
+AUDIO_SILENCE_MIN_SECONDS = float(os.getenv("AUDIO_SILENCE_MIN_SECONDS", "0.3"))
+AUDIO_SEGMENT_FRAME_SECONDS = 0.02
+# ffmpeg encoders shared by every split in the process, however many run at once
+AUDIO_SEGMENT_ENCODERS = int(os.getenv("AUDIO_SEGMENT_ENCODERS", str(os.cpu_count() or 2)))
+
+_encoder = ThreadPoolExecutor(max_workers=AUDIO_SEGMENT_ENCODERS, thread_name_prefix="segment-encoder")
+
+
+class Segment:
+    """A piece of a recording as 16 kHz mono FLAC, with its position in seconds."""
+
+    __slots__ = ("index", "start", "end", "audio")
+
+    def __init__(self, index, start, end, audio):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.audio = audio
+
+    def __repr__(self):
+        return f"Segment({self.index}, {self.start:.2f}-{self.end:.2f}s)"
+
+
+def find_segments(pcm, sample_rate=AUDIO_SAMPLE_RATE, max_seconds=AUDIO_SEGMENT_MAX_SECONDS, min_seconds=AUDIO_SEGMENT_MIN_SECONDS,
+                  silence_db=AUDIO_SILENCE_DB, min_silence_seconds=AUDIO_SILENCE_MIN_SECONDS):
+    """Split 16-bit mono ``pcm`` into ``(start, end)`` sample ranges of at most ``max_seconds``.
+
+    Each cut goes in the middle of the last pause of at least
+    ``min_silence_seconds`` that keeps the segment within bounds; where there
+    is none (music, crosstalk) it goes at the quietest frame of the window's
+    last quarter instead.
+    """
+    import numpy as np
+
+    samples = np.frombuffer(pcm, dtype="<i2")
+    total = len(samples)
+    max_length = int(max_seconds * sample_rate)
+    if total <= max_length:
+        return [(0, total)]
+
+    frame = int(AUDIO_SEGMENT_FRAME_SECONDS * sample_rate)
+    frames = samples[:total // frame * frame].astype(np.float32).reshape(-1, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1)) / 32768
+    silent = 20 * np.log10(np.maximum(rms, 1e-10)) < silence_db
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    run_starts, run_ends = edges[::2], edges[1::2]
+    long_enough = run_ends - run_starts >= int(min_silence_seconds / AUDIO_SEGMENT_FRAME_SECONDS)
+    cuts = (run_starts + run_ends)[long_enough] // 2 * frame
+
+    min_length = int(min(min_seconds, max_seconds) * sample_rate)
+    bounds, start = [], 0
+    while total - start > max_length:
+        low, high = start + min_length, start + max_length
+        last = np.searchsorted(cuts, high, side="right") - 1
+        if last >= 0 and cuts[last] > low:
+            cut = int(cuts[last])
+        else:
+            # Look near the end of the window so segments stay close to max_seconds
+            first_frame, last_frame = max(low, high - max_length // 4) // frame + 1, high // frame
+            cut = (first_frame + int(np.argmin(rms[first_frame:last_frame]))) * frame if last_frame > first_frame else high
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
+
+
+def split_audio(data, workdir="."):
+    """Decode ``data`` once and return it as FLAC Segments cut at pauses.
+
+    A conformant FLAC whose header says it fits in one segment is passed
+    through without decoding. Raises RuntimeError if ffmpeg cannot read it.
+    """
+    info = flac_stream_info(data)
+    if is_conformant_flac(data) and 0 < info[3] <= AUDIO_SEGMENT_MAX_SECONDS * AUDIO_SAMPLE_RATE:
+        return [Segment(0, 0.0, info[3] / AUDIO_SAMPLE_RATE, data)]
+
+    pcm = decode_to_pcm(data, workdir)
+    bounds = find_segments(pcm)
+    if len(bounds) == 1:
+        audio = data if is_conformant_flac(data) else encode_pcm_flac(pcm)
+        return [Segment(0, 0.0, len(pcm) / 2 / AUDIO_SAMPLE_RATE, audio)]
+
+    # Every segment is its own ffmpeg process, so threads encode them in parallel
+    encoded = list(_encoder.map(encode_pcm_flac, [pcm[2 * start:2 * end] for start, end in bounds]))
+    segments = [Segment(index, start / AUDIO_SAMPLE_RATE, end / AUDIO_SAMPLE_RATE, audio) for index, ((start, end), audio) in enumerate(zip(bounds, encoded))]
+    logger.info(f"Split {len(pcm) / 2 / AUDIO_SAMPLE_RATE:.1f}s of audio into {len(segments)} segments.")
+    return segments
@@ -0,0 +1,131 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/service_registry.log")
+
+
+class UnsupportedLanguageError(Exception):
+    """Raised by a registry loader when upstream has no model for the key.
+
+    These failures are remembered in the negative cache; any other exception
+    raised by the loader is treated as transient and is not cached.
+    """
+
+
+class _InFlight:
+    def __init__(self, generation):
+        self.generation = generation
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ServiceRegistry:
+    """TTL cache of upstream pipeline configs with single-flight loading.
+
+    Concurrent lookups for the same key share one call to ``loader``;
+    unsupported keys are cached for ``negative_ttl`` seconds. ``invalidate``
+    bumps the key's generation, so a load that was already running when the
+    key was invalidated is not cached.
+    """
+
+    def __init__(self, loader, ttl=3600, negative_ttl=300):
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._in_flight = {}
+        self._generations = {}
+        self._epoch = 0
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "coalesced": 0, "loads": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                _, value, error = entry
+                if error is not None:
+                    self._stats["negative_hits"] += 1
+                    raise error
+                self._stats["hits"] += 1
+                return value
+
+            self._stats["misses"] += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight(self._generation(key))
+                self._in_flight[key] = call
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            self._load(key, call)
+        else:
+            call.event.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def _load(self, key, call):
+        try:
+            call.value = self.loader(key)
+            entry = (time.monotonic() + self.ttl, call.value, None)
+            logger.info(f"Resolved {key}, caching for {self.ttl}s.")
+        except UnsupportedLanguageError as e:
+            call.error = e
+            entry = (time.monotonic() + self.negative_ttl, None, e)
+            logger.warning(f"{key} is not supported upstream, caching for {self.negative_ttl}s: {e}")
+        except Exception as e:
+            call.error = e
+            entry = None
+            logger.error(f"Failed to resolve {key}. Error: {e}")
+
+        with self._lock:
+            self._stats["loads"] += 1
+            if call.generation != self._generation(key):
+                logger.info(f"{key} was invalidated while it was loading, not caching the result.")
+            elif entry is not None:
+                self._entries[key] = entry
+            if self._in_flight.get(key) is call:
+                del self._in_flight[key]
+        call.event.set()
+
+    def _generation(self, key):
+        return self._epoch, self._generations.get(key, 0)
+
+    def prewarm(self, keys, max_workers=8):
+        def warm(key):
+            try:
+                self.get(key)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(warm, keys))
+        logger.info(f"Pre-warmed {len(keys)} registry entries.")
+
+    def invalidate(self, key=None):
+        with self._lock:
+            # Lookups from now on start a fresh load instead of joining one
+            # that may return what was just invalidated
+            if key is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._in_flight.clear()
+            else:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._entries.pop(key, None)
+                self._in_flight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            now = time.monotonic()
+            stats["entries"] = sum(1 for expires_at, _, error in self._entries.values() if expires_at > now and error is None)
+            stats["negative_entries"] = sum(1 for expires_at, _, error in self._entries.values() if expires_at > now and error is not None)
+        return stats
@@ -0,0 +1,118 @@
+"""Import-cost report and cold-start budget for the FastAPI app.
+
+Every uvicorn worker imports main.py on start, so its import time is paid
+once per worker on every deploy and autoscaling event. This script imports
+the app in fresh interpreters, lists what the import spends its time on
+(``python -X importtime``) and fails (exit code 1) when the median cold start
+exceeds --budget, or when a dependency that should load lazily is imported
+up front:
+
+    python startup_report.py
+    python startup_report.py --budget 1.5 --runs 7
+    python startup_report.py --top 40 --json startup.json
+
+Timings are machine specific; set the budget for the machine that checks it.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Only needed by some requests; importing them in main.py is a regression
+LAZY_MODULES = ("langchain", "pdfminer")
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("SERVICE_REGISTRY_PREWARM", "0")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def import_profile(module):
+    """``(name, depth, self_us, cumulative_us)`` for every module ``module`` pulls in."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=HERE, env=_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def cold_start(module, runs):
+    """Wall-clock seconds for a fresh interpreter to import ``module``, per run."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=HERE, env=_env(), check=True, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def by_package(rows):
+    totals = {}
+    for name, _, self_us, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module uvicorn imports")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to time")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS, help="Maximum median cold start in seconds")
+    parser.add_argument("--top", type=int, default=25, help="Packages to list")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    packages = by_package(rows)
+    total_us = sum(self_us for _, _, self_us, _ in rows)
+    print(f"{'package':<32} {'import ms':>10} {'share':>7}")
+    for package, self_us in packages[:args.top]:
+        print(f"{package:<32} {self_us / 1000:10.1f} {self_us / total_us:7.1%}")
+    print(f"{'total':<32} {total_us / 1000:10.1f} ({len(rows)} modules)")
+
+    timings = cold_start(args.module, args.runs)
+    median = statistics.median(timings)
+    print(f"\ncold start (python -c 'import {args.module}'): median {median:.3f}s  min {min(timings):.3f}s  budget {args.budget:.3f}s")
+
+    loaded = {name.split(".")[0] for name, _, _, _ in rows}
+    eager = [module for module in LAZY_MODULES if module in loaded]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "module": args.module,
+                "python": sys.version.split()[0],
+                "cold_start": {"median": median, "runs": timings, "budget": args.budget},
+                "packages": dict(packages),
+                "modules": [{"name": name, "depth": depth, "self_us": self_us, "cumulative_us": cumulative_us} for name, depth, self_us, cumulative_us in rows],
+                "eager_lazy_modules": eager
+            }, f, indent=2)
+
+    failed = False
+    if median > args.budget:
+        print(f"REGRESSION cold start {median:.3f}s exceeds the {args.budget:.3f}s budget")
+        failed = True
+    for module in eager:
+        print(f"REGRESSION {module} is imported at startup; import it where it is used")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
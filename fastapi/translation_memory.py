@@ -0,0 +1,177 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/translation_memory.log")
+
+TRANSLATION_MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "1") == "1"
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", "translation_memory.sqlite3")
+TRANSLATION_MEMORY_LRU_SIZE = int(os.getenv("TRANSLATION_MEMORY_LRU_SIZE", "10000"))
+TRANSLATION_MEMORY_MAX_BYTES = int(os.getenv("TRANSLATION_MEMORY_MAX_BYTES", str(512 * 1024 * 1024)))
+# Disk hits whose last_used update is buffered before it is written
+TRANSLATION_MEMORY_TOUCH_BATCH = int(os.getenv("TRANSLATION_MEMORY_TOUCH_BATCH", "1000"))
+
+
+def normalize_text(text):
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+def memory_key(source_language, target_language, service_id, text):
+    raw = "\x1f".join([source_language, target_language, service_id or "", normalize_text(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """Two-tier translation cache: an in-process LRU in front of a SQLite file.
+
+    The SQLite tier is shared by every worker on the host and is trimmed to
+    ``max_bytes`` of stored translations, least recently used first. Reads
+    do not write: the ``last_used`` time of disk hits is buffered and saved
+    with the next write, before an eviction, or every ``touch_batch`` hits.
+    The file is opened on first use, not on construction. Every method may
+    wait on SQLite locks, so call them off the event loop.
+    """
+
+    def __init__(self, path, lru_size=10000, max_bytes=512 * 1024 * 1024, touch_batch=TRANSLATION_MEMORY_TOUCH_BATCH):
+        self.path = path
+        self.lru_size = lru_size
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self._touched = {}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"lru_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._conn = None
+        self._disk_bytes = 0
+
+    def _connect(self):
+        # Called with the lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, target TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+            conn.commit()
+            self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+            self._conn = conn
+            logger.info(f"Opened translation memory {self.path} ({self._disk_bytes} bytes).")
+
+    def _remember(self, key, target):
+        self._lru[key] = target
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                    self._stats["lru_hits"] += 1
+                else:
+                    missing.append(key)
+
+            if missing:
+                self._connect()
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, target FROM translations WHERE key IN ({placeholders})", batch).fetchall()
+                for key, target in rows:
+                    found[key] = target
+                    self._remember(key, target)
+                self._stats["disk_hits"] += len(rows)
+                now = time.time()
+                self._touched.update((key, now) for key, _ in rows)
+            self._stats["misses"] += len(missing) - sum(1 for key in missing if key in found)
+            if len(self._touched) >= self.touch_batch:
+                self._save_touched()
+                self._conn.commit()
+        return found
+
+    def _save_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE translations SET last_used = ? WHERE key = ?", [(last_used, key) for key, last_used in self._touched.items()])
+            self._touched.clear()
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, target in items.items():
+                self._remember(key, target)
+            rows = [(key, target, len(target.encode("utf-8")), now) for key, target in items.items()]
+            self._connect()
+            self._save_touched()
+            self._conn.executemany("INSERT OR REPLACE INTO translations (key, target, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._stats["writes"] += len(rows)
+            self._disk_bytes += sum(row[2] for row in rows)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, key, target):
+        self.put_many({key: target})
+
+    def _evict(self):
+        # Other workers write to the same file, so re-read the real size first
+        self._save_touched()
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+        to_free = self._disk_bytes - int(self.max_bytes * 0.9)
+        if to_free <= 0:
+            return
+        victims, freed = [], 0
+        for key, size in self._conn.execute("SELECT key, size FROM translations ORDER BY last_used"):
+            if freed >= to_free:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM translations WHERE key = ?", victims)
+        self._conn.commit()
+        self._disk_bytes -= freed
+        self._stats["evictions"] += len(victims)
+        logger.info(f"Evicted {len(victims)} translations ({freed} bytes) from {self.path}.")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lru_entries"] = len(self._lru)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["lru_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["lru_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class _DisabledMemory:
+    def get_many(self, keys):
+        return {}
+
+    def get(self, key):
+        return None
+
+    def put_many(self, items):
+        pass
+
+    def put(self, key, target):
+        pass
+
+    def stats(self):
+        return {"enabled": False}
+
+
+if TRANSLATION_MEMORY_ENABLED:
+    translation_memory = TranslationMemory(TRANSLATION_MEMORY_PATH, TRANSLATION_MEMORY_LRU_SIZE, TRANSLATION_MEMORY_MAX_BYTES)
+else:
+    translation_memory = _DisabledMemory()
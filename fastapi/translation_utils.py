@@ -1,27 +1,22 @@
+import time
+import asyncio
+import aiohttp
 import requests
 import json
-import pickle
-import shutil
-import zipfile
+from urllib.parse import urlparse
 import os
-from pydantic import BaseModel
-from pdfminer.high_level import extract_text
-from langchain.docstore.document import Document
-import datetime
 from dotenv import load_dotenv
-import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging_utils import get_logger
+import http_client
+from service_registry import ServiceRegistry, UnsupportedLanguageError
+from translation_memory import translation_memory, memory_key
+from rate_limiter import RateGovernor
+from retry_policy import RetryPolicy, Hedger
+from circuit_breaker import circuit_breakers, CircuitOpenError
 
 load_dotenv()
 
-# Configure logging
-log_filename = "logs/translation_application.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
+logger = get_logger(__name__, "logs/translation_application.log")
 
 userID = os.getenv("userID")
 ulcaApiKey = os.getenv("ulcaApiKey")
@@ -37,21 +32,101 @@ languages = {
 def get_languages():
     return languages
 
-def get_service_id(source_language):
-    url = "https://meity-auth.ulcacontrib.org/ulca/apis/v0/model/getModelsPipeline"
+# Point these at mock_bhashini.py to run without the real upstream
+ULCA_PIPELINE_URL = os.getenv("ULCA_PIPELINE_URL", "https://meity-auth.ulcacontrib.org/ulca/apis/v0/model/getModelsPipeline")
+PIPELINE_ID = "64392f96daac500b55c543cd"
+BHASHINI_INFERENCE_URL = os.getenv("BHASHINI_INFERENCE_URL", "https://dhruva-api.bhashini.gov.in/services/inference/pipeline")
+
+SERVICE_REGISTRY_TTL = int(os.getenv("SERVICE_REGISTRY_TTL", "3600"))
+SERVICE_REGISTRY_NEGATIVE_TTL = int(os.getenv("SERVICE_REGISTRY_NEGATIVE_TTL", "300"))
+
+# Upper bounds for packing several chunks into one translation compute request
+TRANSLATION_BATCH_CHARS = int(os.getenv("TRANSLATION_BATCH_CHARS", "16000"))
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "32"))
+# Upstream answers that mean the batch itself was too large or malformed
+BATCH_SPLIT_STATUS_CODES = {400, 413, 422}
+# Compute requests a single document may have in flight at once
+TRANSLATION_MAX_IN_FLIGHT = int(os.getenv("TRANSLATION_MAX_IN_FLIGHT", "8"))
+
+translation_governor = RateGovernor.from_env("translation", "TRANSLATION")
+asr_governor = RateGovernor.from_env("asr", "ASR", rate=4, initial=2, maximum=16)
+translation_retry = RetryPolicy.from_env("TRANSLATION")
+asr_retry = RetryPolicy.from_env("ASR")
+ulca_retry = RetryPolicy.from_env("ULCA")
+translation_hedger = Hedger.from_env("TRANSLATION")
+asr_hedger = Hedger.from_env("ASR")
+
+def _breaker(url, service_id=None):
+    host = urlparse(url).hostname
+    return circuit_breakers.get(f"{host} {service_id}" if service_id else host)
+
+def _record_outcome(breaker, probe, started, response, cancelled=False):
+    # Only transport errors and 5xx count against the upstream; a call that was
+    # cancelled (client disconnect, failed sibling) or never got a slot says nothing
+    if cancelled or started is None:
+        breaker.cancel(probe)
+        return
+    breaker.record(response is not None and response.status_code < 500, time.monotonic() - started, probe)
+
+async def _post_inference_async(breaker, governor, hedger, retry_policy, registry_key, url, **kwargs):
+    # Inference calls are pure functions of the payload, so they are safe to
+    # retry and hedge. Each attempt checks the circuit breaker before queueing
+    # for a governor slot; a hedge shares the slot of the attempt it duplicates
+    # so latency samples exclude queueing.
+    async def send():
+        probe = breaker.before_call()
+        started = response = None
+        cancelled = False
+        try:
+            async with governor.slot_async() as permit:
+                started = time.monotonic()
+                response = await hedger.call_async(lambda: http_client.post_async(url, **kwargs))
+                permit.status_code = response.status_code
+        except (asyncio.CancelledError, GeneratorExit):
+            cancelled = True
+            raise
+        finally:
+            _record_outcome(breaker, probe, started, response, cancelled)
+        return response
+    response = await retry_policy.call_async(send, idempotent=True, description=f"{governor.name} request")
+    if registry_key is not None and response.status_code in (401, 403):
+        # The cached pipeline config (inference key, service ID) was revoked or
+        # rotated upstream; resolve it again on the next request. ASR calls pass
+        # no key: they authenticate with the Authorization setting, not the registry
+        logger.warning(f"{governor.name} request was rejected with {response.status_code}, evicting {registry_key} from the service registry.")
+        service_registry.invalidate(registry_key)
+    return response
+
+def _post_ulca(payload, headers):
+    breaker = _breaker(ULCA_PIPELINE_URL)
+    probe = breaker.before_call()
+    started, response = time.monotonic(), None
+    try:
+        response = http_client.post(ULCA_PIPELINE_URL, json=payload, headers=headers)
+    finally:
+        _record_outcome(breaker, probe, started, response)
+    return response
+
+def _raise_if_unsupported(e, task_type, source_language):
+    # 4xx other than auth/throttling means ULCA has no model for this language
+    response = getattr(e, "response", None)
+    if response is not None and 400 <= response.status_code < 500 and response.status_code not in (401, 403, 429):
+        raise UnsupportedLanguageError(f"No {task_type} model for {source_language} (HTTP {response.status_code})") from e
+
+def _load_pipeline_config(key):
+    task_type, source_language = key
+    config = {"language": {"sourceLanguage": source_language}}
+    if task_type == "translation":
+        config["language"]["targetLanguage"] = "en"
     payload = {
         "pipelineTasks": [
             {
-                "taskType": "asr",
-                "config": {
-                    "language": {
-                        "sourceLanguage": source_language
-                    }
-                }
+                "taskType": task_type,
+                "config": config
             }
         ],
         "pipelineRequestConfig": {
-            "pipelineId": "64392f96daac500b55c543cd"
+            "pipelineId": PIPELINE_ID
         }
     }
     headers = {
@@ -60,19 +135,41 @@ def get_service_id(source_language):
         "ulcaApiKey": ulcaApiKey
     }
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = ulca_retry.call(lambda: _post_ulca(payload, headers), idempotent=True, description=f"{task_type} config lookup")
         response.raise_for_status()
-        response_data = response.json()
-        service_id = response_data["pipelineResponseConfig"][0]["config"][0]["serviceId"]
+    except requests.HTTPError as e:
+        _raise_if_unsupported(e, task_type, source_language)
+        raise
+    response_data = response.json()
+    try:
+        endpoint = response_data.get("pipelineInferenceAPIEndPoint") or {}
+        return {
+            "serviceId": response_data["pipelineResponseConfig"][0]["config"][0]["serviceId"],
+            "callbackUrl": endpoint.get("callbackUrl"),
+            "inferenceApiKey": endpoint.get("inferenceApiKey")
+        }
+    except (KeyError, IndexError, TypeError) as e:
+        raise UnsupportedLanguageError(f"No {task_type} model for {source_language}") from e
+
+service_registry = ServiceRegistry(_load_pipeline_config, ttl=SERVICE_REGISTRY_TTL, negative_ttl=SERVICE_REGISTRY_NEGATIVE_TTL)
+
+def prewarm_service_registry():
+    keys = [(task_type, language) for language in languages.values() for task_type in ("asr", "translation")]
+    service_registry.prewarm(keys)
+
+def _get_service_id(source_language):
+    try:
+        service_id = service_registry.get(("asr", source_language))["serviceId"]
         logger.info(f"Service ID for {source_language} obtained successfully.")
         return service_id
-    except requests.RequestException as e:
+    except CircuitOpenError:
+        raise
+    except Exception as e:
         logger.error(f"Failed to get service ID for {source_language}. Error: {e}")
         return None
 
-def transcribe_and_translate(audio_content, service_id, source_language):
-    url = "https://dhruva-api.bhashini.gov.in/services/inference/pipeline"
-    payload = json.dumps({
+def _asr_payload(audio_contents, service_id, source_language):
+    return {
         "pipelineTasks": [
             {
                 "taskType": "asr",
@@ -97,28 +194,104 @@ def transcribe_and_translate(audio_content, service_id, source_language):
             }
         ],
         "inputData": {
-            "audio": [
-                {
-                    "audioContent": audio_content
-                }
-            ]
+            "audio": [{"audioContent": audio_content} for audio_content in audio_contents]
         }
-    })
-    headers = {
+    }
+
+def _without_none(headers):
+    # aiohttp rejects None header values; requests used to drop them silently
+    return {name: value for name, value in headers.items() if value is not None}
+
+def _asr_headers():
+    return _without_none({
         'Authorization': Authorization,
         'Content-Type': 'application/json'
-    }
+    })
+
+async def transcribe_and_translate_async(audio_content, service_id, source_language):
+    payload = json.dumps(_asr_payload([audio_content], service_id, source_language))
     try:
-        response = requests.post(url, headers=headers, data=payload)
+        response = await _post_inference_async(_breaker(BHASHINI_INFERENCE_URL, service_id), asr_governor, asr_hedger, asr_retry, None, BHASHINI_INFERENCE_URL, headers=_asr_headers(), data=payload)
         response.raise_for_status()
         logger.info(f"Transcription and translation successful for audio content.")
         return response.json()
-    except requests.RequestException as e:
-        logger.error(f"Failed to transcribe and translate audio content. Error: {e}")
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        logger.error(f"Failed to transcribe and translate audio content. Error: {e!r}")
         return None
 
-def make_translation_request(source_language):
-    payload = {
+async def _transcribe_and_translate_batch_async(audio_contents, service_id, source_language):
+    payload = json.dumps(_asr_payload(audio_contents, service_id, source_language))
+    try:
+        response = await _post_inference_async(_breaker(BHASHINI_INFERENCE_URL, service_id), asr_governor, asr_hedger, asr_retry, None, BHASHINI_INFERENCE_URL, headers=_asr_headers(), data=payload)
+        response.raise_for_status()
+        logger.info(f"Transcription and translation successful for {len(audio_contents)} clip(s).")
+        return response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Failed to transcribe and translate {len(audio_contents)} clip(s). Error: {e!r}")
+        status_code = e.status if isinstance(e, aiohttp.ClientResponseError) else 503
+        return {"status_code": status_code, "message": "Error in transcription"}
+    except ValueError as e:
+        logger.error(f"Transcription response for {len(audio_contents)} clip(s) was not JSON. Error: {e!r}")
+        return {"status_code": 502, "message": "Malformed transcription response"}
+
+def _asr_batch_results(response_data, count):
+    """Split pipelineResponse[0|1].output[i] into one single-clip response per input, or None if the batch failed."""
+    if "status_code" in response_data and response_data["status_code"] != 200:
+        return None
+    try:
+        asr, translation = response_data["pipelineResponse"][0], response_data["pipelineResponse"][1]
+        if len(asr["output"]) != count or len(translation["output"]) != count:
+            logger.error(f"ASR batch returned {len(asr['output'])}/{len(translation['output'])} outputs for {count} clips.")
+            return None
+        return [{"pipelineResponse": [{**asr, "output": [source]}, {**translation, "output": [target]}]} for source, target in zip(asr["output"], translation["output"])]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+async def transcribe_and_translate_batch_async(audio_contents, service_id, source_language):
+    """Transcribe and translate several base64 clips in one pipeline request.
+
+    Returns one result per clip, in order, shaped like the result of
+    transcribe_and_translate_async() (None for a clip that failed). A batch
+    the upstream rejects for its payload, or answers with the wrong number of
+    outputs, is retried as two halves down to single clips; on a 5xx or a
+    transport error every clip of the batch fails rather than re-sending the
+    audio at every level of bisection.
+    """
+    response_data = await _transcribe_and_translate_batch_async(audio_contents, service_id, source_language)
+    results = _asr_batch_results(response_data, len(audio_contents))
+    if results is not None:
+        return results
+    if not _should_split(response_data, len(audio_contents)):
+        logger.error(f"ASR batch of {len(audio_contents)} failed with status {response_data.get('status_code')}, not splitting it.")
+        return [None] * len(audio_contents)
+
+    mid = len(audio_contents) // 2
+    logger.warning(f"ASR batch of {len(audio_contents)} failed, retrying as batches of {mid} and {len(audio_contents) - mid}.")
+    first = await transcribe_and_translate_batch_async(audio_contents[:mid], service_id, source_language)
+    return first + await transcribe_and_translate_batch_async(audio_contents[mid:], service_id, source_language)
+
+def _make_translation_request(source_language):
+    try:
+        pipeline_config = service_registry.get(("translation", source_language))
+        logger.info(f"Translation request for {source_language} made successfully.")
+        return pipeline_config
+    except UnsupportedLanguageError as e:
+        logger.error(f"Error making translation request for {source_language}. Error: {e}")
+        return {"status_code": 400, "message": f"Translation from {source_language} is not supported"}
+    except requests.RequestException as e:
+        logger.error(f"Error making translation request for {source_language}. Error: {e}")
+        status_code = e.response.status_code if e.response is not None else 503
+        return {"status_code": status_code, "message": "Error in translation request"}
+
+async def get_service_id_async(source_language):
+    # Registry hits are a dict lookup; only a cold miss blocks a pool thread
+    return await asyncio.to_thread(_get_service_id, source_language)
+
+async def make_translation_request_async(source_language):
+    return await asyncio.to_thread(_make_translation_request, source_language)
+
+def _translation_payload(pipeline_config, source_language, contents):
+    return {
         "pipelineTasks": [
             {
                 "taskType": "translation",
@@ -126,182 +299,326 @@ def make_translation_request(source_language):
                     "language": {
                         "sourceLanguage": source_language,
                         "targetLanguage": "en"
-                    }
+                    },
+                    "serviceId": pipeline_config["serviceId"]
                 }
             }
         ],
-        "pipelineRequestConfig": {
-            "pipelineId": "64392f96daac500b55c543cd"
+        "inputData": {
+            "input": [
+                {
+                    "source": content
+                } for content in contents
+            ]
         }
     }
 
-    headers = {
+def _inference_headers(pipeline_config):
+    return _without_none({
         "Content-Type": "application/json",
-        "userID": userID,
-        "ulcaApiKey": ulcaApiKey
-    }
+        pipeline_config["inferenceApiKey"]["name"]:
+            pipeline_config["inferenceApiKey"]["value"]
+    })
 
-    try:
-        response = requests.post('https://meity-auth.ulcacontrib.org/ulca/apis/v0/model/getModelsPipeline', json=payload, headers=headers)
-        response.raise_for_status()
-        logger.info(f"Translation request for {source_language} made successfully.")
-        return response.json()
-    except requests.RequestException as e:
-        logger.error(f"Error making translation request for {source_language}. Error: {e}")
-        return {"status_code": response.status_code, "message": "Error in translation request"}
+async def perform_translation_async(pipeline_config, source_language, content):
+    return await perform_translation_batch_async(pipeline_config, source_language, [content])
 
-def perform_translation(response_data, source_language, content):
+async def perform_translation_batch_async(pipeline_config, source_language, contents):
     try:
-        service_id = response_data["pipelineResponseConfig"][0]["config"][0]["serviceId"]
-        compute_payload = {
-            "pipelineTasks": [
-                {
-                    "taskType": "translation",
-                    "config": {
-                        "language": {
-                            "sourceLanguage": source_language,
-                            "targetLanguage": "en"
-                        },
-                        "serviceId": service_id
-                    }
-                }
-            ],
-            "inputData": {
-                "input": [
-                    {
-                        "source": content
-                    }
-                ]
-            }
-        }
-
-        callback_url = response_data["pipelineInferenceAPIEndPoint"]["callbackUrl"]
-        
-        headers2 = {
-            "Content-Type": "application/json",
-            response_data["pipelineInferenceAPIEndPoint"]["inferenceApiKey"]["name"]:
-                response_data["pipelineInferenceAPIEndPoint"]["inferenceApiKey"]["value"]
-        }
-
-        compute_response = requests.post(callback_url, json=compute_payload, headers=headers2)
+        compute_payload = _translation_payload(pipeline_config, source_language, contents)
+        compute_response = await _post_inference_async(_breaker(pipeline_config["callbackUrl"], pipeline_config["serviceId"]), translation_governor, translation_hedger, translation_retry, ("translation", source_language), pipeline_config["callbackUrl"], json=compute_payload, headers=_inference_headers(pipeline_config))
         compute_response.raise_for_status()
-        logger.info(f"Translation performed successfully for content.")
+        logger.info(f"Translation performed successfully for {len(contents)} segment(s).")
         return compute_response.json()
-    except requests.RequestException as e:
-        logger.error(f"Error performing translation. Error: {e}")
-        return {"status_code": compute_response.status_code, "message": "Error in translation"}
-
-def translate(source_language, content):
-    response_data = make_translation_request(source_language)
-    
-    if "status_code" in response_data and response_data["status_code"] != 200:
-        return response_data
-    
-    compute_response_data = perform_translation(response_data, source_language, content)
-    
-    if "status_code" in compute_response_data and compute_response_data["status_code"] != 200:
-        return compute_response_data
-    
-    translated_content = compute_response_data["pipelineResponse"][0]["output"][0]["target"]
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error performing translation. Error: {e!r}")
+        status_code = e.status if isinstance(e, aiohttp.ClientResponseError) else 503
+        return {"status_code": status_code, "message": "Error in translation"}
+    except ValueError as e:
+        logger.error(f"Translation response was not JSON. Error: {e!r}")
+        return {"status_code": 502, "message": "Malformed translation response"}
+
+def _success(translated_content):
     return {
         "status_code": 200,
         "message": "Translation successful",
         "translated_content": translated_content
     }
 
+def _translation_result(compute_response_data):
+    if "status_code" in compute_response_data and compute_response_data["status_code"] != 200:
+        return compute_response_data
+
+    return _success(compute_response_data["pipelineResponse"][0]["output"][0]["target"])
+
+async def _recall(pipeline_config, source_language, contents):
+    """Look contents up in the translation memory.
+
+    Returns the memory keys, the remembered translations and the unique
+    contents (by key) that still have to go upstream.
+    """
+    keys = [memory_key(source_language, "en", pipeline_config["serviceId"], content) for content in contents]
+    # SQLite can wait up to its busy timeout on other workers' writes
+    remembered = await asyncio.to_thread(translation_memory.get_many, keys)
+    pending = {}
+    for key, content in zip(keys, contents):
+        if key not in remembered:
+            pending.setdefault(key, content)
+    if remembered:
+        logger.info(f"Translation memory answered {len(keys) - len(pending)} of {len(keys)} segment(s).")
+    return keys, remembered, pending
+
+async def _store(fresh):
+    await asyncio.to_thread(translation_memory.put_many, {key: result["translated_content"] for key, result in fresh.items() if result["status_code"] == 200})
+
+async def _memorize(keys, remembered, pending, translated):
+    fresh = dict(zip(pending, translated))
+    await _store(fresh)
+    return [_success(remembered[key]) if key in remembered else fresh[key] for key in keys]
+
+async def translate_async(source_language, content):
+    pipeline_config = await make_translation_request_async(source_language)
+
+    if "status_code" in pipeline_config and pipeline_config["status_code"] != 200:
+        return pipeline_config
+
+    keys, remembered, pending = await _recall(pipeline_config, source_language, [content])
+    translated = [_translation_result(await perform_translation_async(pipeline_config, source_language, content))] if pending else []
+    return (await _memorize(keys, remembered, pending, translated))[0]
+
+def _make_batches(contents, max_chars, max_items):
+    batches = []
+    batch, batch_chars = [], 0
+    for content in contents:
+        if batch and (batch_chars + len(content) > max_chars or len(batch) >= max_items):
+            batches.append(batch)
+            batch, batch_chars = [], 0
+        batch.append(content)
+        batch_chars += len(content)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _batch_results(compute_response_data, count):
+    """Map pipelineResponse[0].output[i] back to the i-th input, or None if the batch failed."""
+    if "status_code" in compute_response_data and compute_response_data["status_code"] != 200:
+        return None
+    try:
+        outputs = compute_response_data["pipelineResponse"][0]["output"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    if len(outputs) != count:
+        logger.error(f"Translation batch returned {len(outputs)} outputs for {count} inputs.")
+        return None
+    return [_success(output["target"]) for output in outputs]
+
+def _should_split(compute_response_data, count):
+    # Only a rejected payload or a 200 with the wrong number of outputs (no
+    # status_code) can be fixed by smaller batches. 5xx and transport errors
+    # fail the whole batch: every half would be retried again by the
+    # RetryPolicy against an upstream that is already struggling.
+    status_code = compute_response_data.get("status_code")
+    return count > 1 and (status_code is None or status_code in BATCH_SPLIT_STATUS_CODES)
+
+def _batch_error(compute_response_data, count):
+    if "status_code" not in compute_response_data:
+        compute_response_data = {"status_code": 502, "message": "Malformed translation response"}
+    return [compute_response_data] * count
+
+async def _translate_batch_async(pipeline_config, source_language, contents):
+    compute_response_data = await perform_translation_batch_async(pipeline_config, source_language, contents)
+    results = _batch_results(compute_response_data, len(contents))
+    if results is not None:
+        return results
+    if not _should_split(compute_response_data, len(contents)):
+        return _batch_error(compute_response_data, len(contents))
+
+    mid = len(contents) // 2
+    logger.warning(f"Translation batch of {len(contents)} failed, retrying as batches of {mid} and {len(contents) - mid}.")
+    first = await _translate_batch_async(pipeline_config, source_language, contents[:mid])
+    return first + await _translate_batch_async(pipeline_config, source_language, contents[mid:])
+
+async def translate_batch_async(source_language, contents, max_chars=TRANSLATION_BATCH_CHARS, max_items=TRANSLATION_BATCH_SIZE, max_in_flight=TRANSLATION_MAX_IN_FLIGHT):
+    """Translate many segments with as few compute requests as the size budget allows.
+
+    Segments found in the translation memory, and repeats within ``contents``,
+    are not sent upstream. Up to ``max_in_flight`` batches are sent
+    concurrently. Returns one result per input, in input order, shaped like
+    the result of translate_async().
+    """
+    pipeline_config = await make_translation_request_async(source_language)
+
+    if "status_code" in pipeline_config and pipeline_config["status_code"] != 200:
+        return [pipeline_config] * len(contents)
+
+    keys, remembered, pending = await _recall(pipeline_config, source_language, contents)
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def run(batch):
+        async with semaphore:
+            return await _translate_batch_async(pipeline_config, source_language, batch)
+
+    batch_results = await asyncio.gather(*(run(batch) for batch in _make_batches(list(pending.values()), max_chars, max_items)))
+    translated = [result for results in batch_results for result in results]
+    return await _memorize(keys, remembered, pending, translated)
+
+async def translate_batch_stream_async(source_language, contents, max_chars=TRANSLATION_BATCH_CHARS, max_items=TRANSLATION_BATCH_SIZE, max_in_flight=TRANSLATION_MAX_IN_FLIGHT):
+    """Like translate_batch_async, but yields ``(index, result)`` pairs as soon as
+    each batch comes back instead of waiting for all of them.
+    """
+    pipeline_config = await make_translation_request_async(source_language)
+
+    if "status_code" in pipeline_config and pipeline_config["status_code"] != 200:
+        for index in range(len(contents)):
+            yield index, pipeline_config
+        return
+
+    keys, remembered, pending = await _recall(pipeline_config, source_language, contents)
+    positions = {}
+    for index, key in enumerate(keys):
+        if key in remembered:
+            yield index, _success(remembered[key])
+        else:
+            positions.setdefault(key, []).append(index)
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def run(batch_keys, batch):
+        async with semaphore:
+            return batch_keys, await _translate_batch_async(pipeline_config, source_language, batch)
+
+    pending_keys = list(pending)
+    tasks, offset = [], 0
+    for batch in _make_batches(list(pending.values()), max_chars, max_items):
+        tasks.append(asyncio.ensure_future(run(pending_keys[offset:offset + len(batch)], batch)))
+        offset += len(batch)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            batch_keys, results = await next_done
+            fresh = dict(zip(batch_keys, results))
+            await _store(fresh)
+            for key, result in fresh.items():
+                for index in positions[key]:
+                    yield index, result
+    finally:
+        # The consumer went away (client disconnect); stop sending batches
+        for task in tasks:
+            task.cancel()
+
 def split_text_into_chunks(text, chunk_size=4000, chunk_overlap=300):
     chunks = []
     for i in range(0, len(text), chunk_size - chunk_overlap):
         chunks.append(text[i:i + chunk_size])
     return chunks
 
-def translate_chunks_pdf(source_language, pickle_dir="./pdf_chunks", output_dir="english_chunks"):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    pickle_files = [f for f in os.listdir(pickle_dir) if f.endswith('.pkl')]
-
-    translation_results = {}
-
-    for pickle_file in pickle_files:
-        with open(os.path.join(pickle_dir, pickle_file), 'rb') as file:
-            docObjs = pickle.load(file)
-
-        chunk_counter = 0
-        for docObj in docObjs:
-            source_chunks = docObj.page_content
-            logger.info(f"Translating chunk {chunk_counter} of {pickle_file}.")
-            translated_chunks = translate(source_language, source_chunks)
-            
-            if translated_chunks["status_code"] == 200:
-                translated_content = translated_chunks["translated_content"]
-                logger.info(f"Chunk {chunk_counter} of {pickle_file} translated successfully.")
-            else:
-                translated_content = ""
-                logger.error(f"Error translating chunk {chunk_counter} of {pickle_file}: {translated_chunks['message']}")
-
-            translation_results[f"{pickle_file}_{chunk_counter}"] = {
-                "original_chunk": source_chunks,
-                "translated_chunk": translated_content,
-                "status": translated_chunks["status_code"],
-                "message": translated_chunks["message"],
-                "source_file": pickle_file
-            }
-            chunk_counter += 1
-            docObj.page_content = translated_content
-
-            # Save English pickle file
-            output_pickle_file = os.path.join(output_dir, f"english_{pickle_file}")
-            with open(output_pickle_file, 'wb') as output_file:
-                pickle.dump(docObj, output_file)
-    return translation_results
-
-def translate_chunks_txt(source_language, pickle_dir="./txt_chunks", output_dir="english_chunks"):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    pickle_files = [f for f in os.listdir(pickle_dir) if f.endswith('.pkl')]
-
+RESULT_FIELDS = ("original_chunk", "translated_chunk", "status", "message", "source_file")
+
+def _chunk_result(pickle_file, chunk_counter, docObj, translated_chunks, output_store):
+    source_chunks = docObj.text
+    if translated_chunks["status_code"] == 200:
+        translated_content = translated_chunks["translated_content"]
+        logger.info(f"Chunk {chunk_counter} of {pickle_file} translated successfully.")
+    else:
+        translated_content = ""
+        logger.error(f"Error translating chunk {chunk_counter} of {pickle_file}: {translated_chunks['message']}")
+
+    chunk_id = f"{pickle_file}_{chunk_counter}"
+    entry = {
+        "original_chunk": source_chunks,
+        "translated_chunk": translated_content,
+        "status": translated_chunks["status_code"],
+        "message": translated_chunks["message"],
+        "source_file": pickle_file
+    }
+    if output_store is not None:
+        output_store.append(chunk_id, {**entry, "metadata": docObj.metadata})
+    return chunk_id, entry
+
+def _resumed_result(output_store, chunk_id):
+    """The stored result for ``chunk_id`` if an earlier run translated it successfully."""
+    record = output_store.get(chunk_id) if output_store is not None else None
+    if record is None or record["status"] != 200:
+        return None
+    return {key: record[key] for key in RESULT_FIELDS}
+
+def _pending_chunks(chunk_store, output_store, translation_results):
+    """Fill ``translation_results`` with resumed chunks and return the rest, keeping chunk order."""
+    pending = []
+    for pickle_file, docObjs in chunk_store.files():
+        for chunk_counter, docObj in enumerate(docObjs):
+            chunk_id = f"{pickle_file}_{chunk_counter}"
+            translation_results[chunk_id] = _resumed_result(output_store, chunk_id)
+            if translation_results[chunk_id] is None:
+                pending.append((pickle_file, chunk_counter, docObj))
+    resumed = len(translation_results) - len(pending)
+    if resumed:
+        logger.info(f"Resuming with {resumed} of {len(translation_results)} chunks already translated.")
+    return pending
+
+async def translate_chunks_async(source_language, chunk_store, output_store=None, max_in_flight=TRANSLATION_MAX_IN_FLIGHT):
     translation_results = {}
-
-    for pickle_file in pickle_files:
-        with open(os.path.join(pickle_dir, pickle_file), 'rb') as file:
-            docObjs = pickle.load(file)
-
-        chunk_counter = 0
-        for docObj in docObjs:
-            source_chunks = docObj.page_content
-            logger.info(f"Translating chunk {chunk_counter} of {pickle_file}.")
-            translated_chunks = translate(source_language, source_chunks)
-            
-            if translated_chunks["status_code"] == 200:
-                translated_content = translated_chunks["translated_content"]
-                logger.info(f"Chunk {chunk_counter} of {pickle_file} translated successfully.")
-            else:
-                translated_content = ""
-                logger.error(f"Error translating chunk {chunk_counter} of {pickle_file}: {translated_chunks['message']}")
-
-            translation_results[f"{pickle_file}_{chunk_counter}"] = {
-                "original_chunk": source_chunks,
-                "translated_chunk": translated_content,
-                "status": translated_chunks["status_code"],
-                "message": translated_chunks["message"],
-                "source_file": pickle_file
-            }
-            chunk_counter += 1
-            docObj.page_content = translated_content
-
-            # Save English pickle file
-            output_pickle_file = os.path.join(output_dir, f"english_{pickle_file}")
-            with open(output_pickle_file, 'wb') as output_file:
-                pickle.dump(docObj, output_file)
+    chunks = _pending_chunks(chunk_store, output_store, translation_results)
+    logger.info(f"Translating {len(chunks)} chunks.")
+    translated = await translate_batch_async(source_language, [docObj.text for _, _, docObj in chunks], max_in_flight=max_in_flight)
+    for (pickle_file, chunk_counter, docObj), translated_chunks in zip(chunks, translated):
+        chunk_id, entry = _chunk_result(pickle_file, chunk_counter, docObj, translated_chunks, output_store)
+        translation_results[chunk_id] = entry
     return translation_results
 
-def start_translation_pdf(source_language):
-    return translate_chunks_pdf(source_language)
-
-def start_translation_txt(source_language):
-    return translate_chunks_txt(source_language)
+def _chunk_windows(chunk_store, window_chars):
+    """Group chunks across files into windows of roughly ``window_chars`` characters."""
+    window, window_size = [], 0
+    for pickle_file, docObjs in chunk_store.files():
+        for chunk_counter, docObj in enumerate(docObjs):
+            window.append((pickle_file, chunk_counter, docObj))
+            window_size += len(docObj.text)
+            if window_size >= window_chars:
+                yield window
+                window, window_size = [], 0
+    if window:
+        yield window
+
+async def stream_translation(source_language, chunk_store, output_store=None, max_in_flight=TRANSLATION_MAX_IN_FLIGHT):
+    """Yield one event per translated chunk, then a summary event.
+
+    Chunks are translated a window at a time, large enough to keep every
+    in-flight slot busy, and results are not accumulated, so memory stays
+    flat however large the upload is. Chunks already in ``output_store``
+    from an interrupted run are reported without translating them again.
+    """
+    total = chunk_store.count()
+    logger.info(f"Streaming translation of {total} chunks.")
+    started = time.monotonic()
+    time_to_first_result = None
+    completed = failed = 0
+    for window in _chunk_windows(chunk_store, 2 * max_in_flight * TRANSLATION_BATCH_CHARS):
+        pending = []
+        for pickle_file, chunk_counter, docObj in window:
+            chunk_id = f"{pickle_file}_{chunk_counter}"
+            entry = _resumed_result(output_store, chunk_id)
+            if entry is None:
+                pending.append((pickle_file, chunk_counter, docObj))
+                continue
+            completed += 1
+            yield {"event": "chunk", "id": chunk_id, **entry, "completed": completed, "total": total, "elapsed": round(time.monotonic() - started, 3)}
+        contents = [docObj.text for _, _, docObj in pending]
+        async for index, translated_chunks in translate_batch_stream_async(source_language, contents, max_in_flight=max_in_flight):
+            pickle_file, chunk_counter, docObj = pending[index]
+            chunk_id, entry = _chunk_result(pickle_file, chunk_counter, docObj, translated_chunks, output_store)
+            completed += 1
+            failed += translated_chunks["status_code"] != 200
+            elapsed = time.monotonic() - started
+            if time_to_first_result is None:
+                time_to_first_result = elapsed
+            yield {"event": "chunk", "id": chunk_id, **entry, "completed": completed, "total": total, "elapsed": round(elapsed, 3)}
+    yield {
+        "event": "done",
+        "completed": completed,
+        "failed": failed,
+        "total": total,
+        "time_to_first_result": round(time_to_first_result, 3) if time_to_first_result is not None else None,
+        "elapsed": round(time.monotonic() - started, 3)
+    }
 
 # if __name__ == "__main__":
 #     source_language = "hi" 
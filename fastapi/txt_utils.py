@@ -1,23 +1,11 @@
 import os
 import zipfile
-import shutil
-import pickle
-from pdfminer.high_level import extract_text
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+from chunk_store import make_chunks, member_name
 from concurrent.futures import ThreadPoolExecutor
 import tempfile
-import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging_utils import get_logger
 
-# Configure logging
-log_filename = "logs/txt_processing.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
+logger = get_logger(__name__, "logs/txt_processing.log")
 
 def is_zipfile(file_path):
     try:
@@ -36,6 +24,8 @@ def unzip_folder(zip_path, output_folder):
         logger.error(f"Failed to unzip file: {zip_path}. Error: {e}")
 
 def split_docs(documents, chunk_size=4000, chunk_overlap=300):
+    # LangChain is slow to import; only pay for it once there is text to split
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     docs = text_splitter.split_text(documents)
     logger.info(f"Split documents into {len(docs)} chunks")
@@ -48,11 +38,11 @@ def get_txt_files(root_directory):
             if file.lower().endswith('.txt'):
                 txt_files.append(os.path.join(root, file))
     logger.info(f"Found {len(txt_files)} .txt files in {root_directory}")
-    return txt_files
+    return sorted(txt_files)
 
-def txt_reader(file):
+def txt_reader(file, chunk_store, workdir=None):
     results = []
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with tempfile.TemporaryDirectory(dir=workdir) as temp_dir:
         file_location = os.path.join(temp_dir, file.filename)
         with open(file_location, "wb") as f:
             f.write(file.file.read())
@@ -64,22 +54,25 @@ def txt_reader(file):
             txt_files = get_txt_files(output_folder)
             num_workers = 5
 
+            names = [member_name(txt_file, output_folder) for txt_file in txt_files]
+            # Read in parallel but add in member order, so chunk order does not depend on thread timing
             with ThreadPoolExecutor(max_workers=num_workers) as executor:
-                futures = [executor.submit(process_txt, txt_file) for txt_file in txt_files]
-                results = [future.result() for future in futures]
+                extracted = list(executor.map(read_txt, txt_files, names, [chunk_store.language] * len(txt_files)))
+            for name, docObjs in zip(names, extracted):
+                if docObjs is not None:
+                    add_chunks(chunk_store, name, docObjs)
+            results = extracted
         else:
             if file_location.lower().endswith('.txt'):
-                result = process_txt(file_location)
+                result = process_txt(file_location, chunk_store)
                 return result
             else:
                 logger.warning(f"Unsupported file type: {file_location}")
                 return None
     return results
 
-def process_txt(txt_path, txt_chunk_dir="txt_chunks", processed_txts_folder="processed_txts"):
-    metadata = []
-    docs = []
-    docObjs = []
+def read_txt(txt_path, filename, language=None):
+    """Chunks of the file's text, or None if it could not be read."""
     try:
         with open(txt_path, 'r', encoding='utf-8') as file:
             content = file.read()
@@ -87,45 +80,19 @@ def process_txt(txt_path, txt_chunk_dir="txt_chunks", processed_txts_folder="pro
     except Exception as e:
         logger.error(f"Failed to read file: {txt_path}. Error: {e}")
         return None
+    return make_chunks(filename, content, split_docs(content), language)
 
-    if not os.path.exists(processed_txts_folder):
-        os.makedirs(processed_txts_folder)
-
-    filename = os.path.basename(txt_path)
-    temp = {'filename': filename}
-    temp['date_filename'] = True
-    
-    chunks = split_docs(content)
-    num = len(chunks)
-    data = [temp for _ in range(num)]
-    metadata.extend(data)
-    docs.extend(chunks)
-
-    for j in range(num):
-        doc_data = docs[j]
-        doc_info = metadata[j]
-        doc_obj = Document(page_content=doc_data, metadata=doc_info)
-        docObjs.append(doc_obj)
-    
-    if not os.path.exists(txt_chunk_dir):
-        os.makedirs(txt_chunk_dir)
-
-    pickle_file = os.path.join(txt_chunk_dir, f"{filename}.pkl")
-    try:
-        with open(pickle_file, 'wb') as file:
-            pickle.dump(docObjs, file)
-        logger.info(f"Saved {len(docObjs)} document chunks to pickle file: {pickle_file}")
-    except Exception as e:
-        logger.error(f"Failed to save pickle file: {pickle_file}. Error: {e}")
-        return None
+def add_chunks(chunk_store, filename, docObjs):
+    # The ".pkl" suffix is kept because result keys and source_file use it
+    chunk_store.add(f"{filename}.pkl", docObjs)
+    logger.info(f"Processed {filename} into {len(docObjs)} chunks")
 
-    try:
-        shutil.move(txt_path, processed_txts_folder)
-        logger.info(f"Moved processed file {txt_path} to {processed_txts_folder}")
-    except Exception as e:
-        logger.error(f"Failed to move processed file: {txt_path}. Error: {e}")
+def process_txt(txt_path, chunk_store, filename=None):
+    filename = filename or os.path.basename(txt_path)
+    docObjs = read_txt(txt_path, filename, chunk_store.language)
+    if docObjs is None:
         return None
-
-    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docObjs]
+    add_chunks(chunk_store, filename, docObjs)
+    return docObjs
 
 
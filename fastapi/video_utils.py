@@ -1,23 +1,8 @@
 import os
 import subprocess
-import shutil
-import logging
-from logging.handlers import TimedRotatingFileHandler
-
-log_filename = "logs/video_processing.log"
-log_handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=7)
-log_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(log_handler)
-
-def delete_output_dirs():
-    if os.path.exists("outputs"):
-        shutil.rmtree("outputs")
-        logger.info("Output directories have been deleted.")
-    else:
-        logger.warning("No output directories found to delete.")
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/video_processing.log")
 
 def convert_videos_to_flac(video_files, output_folder='outputs'):
     os.makedirs(output_folder, exist_ok=True)
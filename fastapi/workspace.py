@@ -0,0 +1,43 @@
+import os
+import shutil
+import asyncio
+import tempfile
+import contextlib
+from logging_utils import get_logger
+
+logger = get_logger(__name__, "logs/workspace.log")
+
+# tmpfs is only used when it has room; Docker's default /dev/shm is 64 MB
+WORKSPACE_SHM_MIN_FREE = int(os.getenv("WORKSPACE_SHM_MIN_FREE", str(1024 * 1024 * 1024)))
+
+
+def _default_root():
+    shm = "/dev/shm"
+    try:
+        if os.access(shm, os.W_OK) and shutil.disk_usage(shm).free >= WORKSPACE_SHM_MIN_FREE:
+            return shm
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT") or _default_root()
+
+
+class Workspace:
+    """Private scratch directories for one request or job."""
+
+    def __init__(self, root):
+        self.root = root
+        self.chunks = os.path.join(root, "chunks")
+        self.translations = os.path.join(root, "translations.jsonl")
+        self.outputs = os.path.join(root, "outputs")
+
+
+@contextlib.asynccontextmanager
+async def open_workspace(prefix="request_"):
+    root = tempfile.mkdtemp(prefix=prefix, dir=WORKSPACE_ROOT)
+    try:
+        yield Workspace(root)
+    finally:
+        # Large uploads can leave thousands of files; keep the event loop free
+        await asyncio.to_thread(shutil.rmtree, root, True)